@@ -0,0 +1,23 @@
+import json
+import os
+
+import pytest
+
+from posts import benchmarks
+from posts.management.commands.benchmark_views import BENCHMARK_CACHES
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+
+def test_views_within_budgets(settings):
+    settings.CACHES = BENCHMARK_CACHES
+    targets = benchmarks.load_dataset()
+    results = benchmarks.run(targets, iterations=10, warmup=2)
+
+    output = os.getenv('BENCHMARK_OUTPUT')
+    if output:
+        with open(output, 'w', encoding='utf-8') as stream:
+            json.dump({'results': results}, stream, ensure_ascii=False, indent=2)
+
+    violations = benchmarks.check_budgets(results)
+    assert not violations, 'Превышены бюджеты:\n' + '\n'.join(violations)
@@ -0,0 +1,34 @@
+import threading
+
+from django.db.utils import OperationalError
+
+
+class BlockingPool:
+    """Пул, в котором поток ждёт освободившееся соединение.
+
+    ThreadedConnectionPool, когда заняты все MAX_SIZE соединений, сразу
+    бросает PoolError. Семафор на MAX_SIZE мест заставляет поток подождать
+    до timeout секунд, и только потом запрос завершается ошибкой базы.
+    """
+
+    def __init__(self, pool, size, timeout):
+        self.pool = pool
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                f'Нет свободного соединения в пуле за {self.timeout} с.'
+            )
+        try:
+            return self.pool.getconn()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection, close=False):
+        # Если пул не принял соединение, оно так и числится занятым,
+        # поэтому место освобождается только после успешного возврата.
+        self.pool.putconn(connection, close=close)
+        self._slots.release()
@@ -0,0 +1,54 @@
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+SHARED_CACHE = 'shared'
+GENERATION_KEY = 'generation:{}'
+
+
+def shared_cache():
+    """Общий для всех процессов кэш без локальной копии."""
+    return caches[SHARED_CACHE]
+
+
+def _initial():
+    # Если счётчик вытеснен из кэша, новое значение не должно совпасть
+    # с одним из прежних, иначе вернутся устаревшие фрагменты.
+    return time.time_ns()
+
+
+def get_generation(*scopes) -> str:
+    """Возвращает составной номер поколения для набора областей.
+
+    Номер используется как часть ключа кэша: при изменении данных области
+    номер меняется, и старые фрагменты больше не читаются.
+    """
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    cache = shared_cache()
+    values = cache.get_many(keys)
+    missing = {key: _initial() for key in keys if key not in values}
+    if missing:
+        cache.set_many(missing, None)
+        values.update(missing)
+    return '.'.join(str(values[key]) for key in keys)
+
+
+def _bump(scopes):
+    cache = shared_cache()
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial(), None)
+
+
+def bump_generation(*scopes):
+    """Сбрасывает кэш областей, увеличивая их номера поколений.
+
+    Номера увеличиваются сразу и ещё раз после фиксации транзакции, чтобы
+    фрагмент, собранный до фиксации, не остался под новым номером.
+    """
+    _bump(scopes)
+    transaction.on_commit(lambda: _bump(scopes))
@@ -0,0 +1,114 @@
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.functional import cached_property
+
+from .metrics import record_cache
+
+_MISSING = object()
+
+
+class TwoLevelCache(BaseCache):
+    """Двухуровневый кэш: локальный LRU процесса перед общим кэшем.
+
+    Чтение сначала идёт в локальный кэш, промахи добираются из общего
+    и запоминаются локально не дольше LOCAL_TIMEOUT секунд. Запись идёт
+    в оба уровня. Изменяемые значения (счётчики, признаки) надёжнее читать
+    прямо из общего кэша: локальные копии в других процессах живут до
+    истечения LOCAL_TIMEOUT.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        self._local = LocMemCache(
+            f'two-level:{location}',
+            {
+                'TIMEOUT': self._local_timeout,
+                'OPTIONS': {
+                    'MAX_ENTRIES': options.get('LOCAL_MAX_ENTRIES', 1000)
+                },
+            },
+        )
+
+    @cached_property
+    def _shared(self):
+        return caches[self._shared_alias]
+
+    def _get_local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self._shared.add(key, value, timeout, version)
+        if added:
+            self._local.set(
+                key, value, self._get_local_timeout(timeout), version
+            )
+        return added
+
+    def get(self, key, default=None, version=None):
+        value = self._local.get(key, _MISSING, version)
+        if value is not _MISSING:
+            record_cache(key, hit=True)
+            return value
+        value = self._shared.get(key, _MISSING, version)
+        record_cache(key, hit=value is not _MISSING)
+        if value is _MISSING:
+            return default
+        self._local.set(key, value, self._local_timeout, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        values = self._local.get_many(keys, version)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            shared = self._shared.get_many(missing, version)
+            self._local.set_many(shared, self._local_timeout, version)
+            values.update(shared)
+        for key in keys:
+            record_cache(key, hit=key in values)
+        return values
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._shared.set(key, value, timeout, version)
+        self._local.set(key, value, self._get_local_timeout(timeout), version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self._shared.set_many(data, timeout, version)
+        self._local.set_many(
+            {key: value for key, value in data.items() if key not in failed},
+            self._get_local_timeout(timeout),
+            version,
+        )
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local.delete(key, version)
+        return self._shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self._local.delete(key, version)
+        self._shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        self._local.delete_many(keys, version)
+        self._shared.delete_many(keys, version)
+
+    def has_key(self, key, version=None):
+        return self._local.has_key(key, version) or self._shared.has_key(
+            key, version
+        )
+
+    def incr(self, key, delta=1, version=None):
+        self._local.delete(key, version)
+        return self._shared.incr(key, delta, version)
+
+    def clear(self):
+        self._local.clear()
+        self._shared.clear()
@@ -0,0 +1,226 @@
+"""Метрики процесса в текстовом формате Prometheus.
+
+Счётчики и гистограммы пишутся без блокировок: у каждого потока своя
+копия значений, а при выдаче /metrics копии всех потоков складываются.
+Копия завершившегося потока остаётся в списке, чтобы счётчики не
+уменьшались. Значения свои у каждого процесса сервера, Prometheus
+различает процессы по адресу или метке instance.
+"""
+import threading
+from bisect import bisect_left
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.db import connections
+
+from .sampling import UNRESOLVED
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REGISTRY = {}
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{_escape(value)}"' for name, value in pairs
+    ) + '}'
+
+
+class Metric:
+    """Метрика с набором меток, значения хранятся по потокам."""
+
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        if name in REGISTRY:
+            raise ValueError(f'Метрика {name} уже зарегистрирована')
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards = []
+        REGISTRY[name] = self
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            self._shards.append(shard)
+        return shard
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labels)
+
+    def _merge(self, total, values):
+        raise NotImplementedError
+
+    def values(self):
+        """Значения по наборам меток, сложенные по всем потокам."""
+        merged = {}
+        for shard in list(self._shards):
+            for key, values in shard.copy().items():
+                merged[key] = self._merge(merged.get(key), values)
+        return merged
+
+    def samples(self):
+        raise NotImplementedError
+
+    def expose(self):
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type}',
+            *self.samples(),
+        ]
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик."""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def _merge(self, total, value):
+        return (total or 0) + value
+
+    def samples(self):
+        values = self.values()
+        if not values and not self.labels:
+            values = {(): 0}
+        return [
+            f'{self.name}{_labels(self.labels, key)} {value}'
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам с суммой и числом наблюдений."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=None):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets or LATENCY_BUCKETS)
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        counts = shard.get(key)
+        if counts is None:
+            # Число попаданий в каждую корзину, последняя – +Inf, и сумма.
+            counts = shard[key] = [0] * (len(self.buckets) + 1) + [0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def _merge(self, total, counts):
+        if total is None:
+            return list(counts)
+        return [left + right for left, right in zip(total, counts)]
+
+    def samples(self):
+        lines = []
+        bounds = [*map(str, self.buckets), '+Inf']
+        for key, counts in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _labels(self.labels, key, [('le', bound)])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _labels(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {counts[-1]}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+def expose():
+    """Все метрики в текстовом формате Prometheus."""
+    lines = []
+    for metric in REGISTRY.values():
+        lines.extend(metric.expose())
+    return ''.join(f'{line}\n' for line in lines)
+
+
+REQUESTS = Counter(
+    'yatube_http_requests_total',
+    'Обработанные запросы',
+    ('view', 'method', 'status'),
+)
+REQUEST_DURATION = Histogram(
+    'yatube_http_request_duration_seconds',
+    'Время обработки запроса',
+    ('view',),
+)
+REQUEST_QUERIES = Histogram(
+    'yatube_db_queries_per_request',
+    'SQL-запросы за один HTTP-запрос',
+    ('view',),
+    buckets=QUERY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    'yatube_cache_requests_total',
+    'Чтения из кэша: cache – имя фрагмента {% cache %} или префикс ключа',
+    ('cache', 'result'),
+)
+
+
+def cache_name(key):
+    """Имя кэша для метки: фрагмент шаблона или префикс ключа до «:»."""
+    if key.startswith('template.cache.'):
+        return key.split('.', 3)[2]
+    if ':' in key:
+        return key.split(':', 1)[0]
+    return 'other'
+
+
+def record_cache(key, hit):
+    CACHE_REQUESTS.inc(cache=cache_name(key), result='hit' if hit else 'miss')
+
+
+class MetricsMiddleware:
+    """Считает запросы, их время и число SQL-запросов по именам адресов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        started = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = self.get_response(request)
+        elapsed = perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else UNRESOLVED
+        REQUESTS.inc(
+            view=view, method=request.method, status=response.status_code
+        )
+        REQUEST_DURATION.observe(elapsed, view=view)
+        REQUEST_QUERIES.observe(queries, view=view)
+        return response
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router, transaction
 
 
 class CreatedModel(models.Model):
@@ -10,3 +10,22 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class AtomicSaveModel(models.Model):
+    """Абстрактная модель, которая сохраняется в одной транзакции
+    с обработчиками post_save.
+
+    Если обработчик не смог обновить счётчики, строка тоже не
+    записывается. Удаление Django и так выполняет в одной транзакции
+    с обработчиками post_delete. Внутри чужой транзакции точка
+    сохранения не создаётся: ошибка откатывает всю внешнюю транзакцию.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, using=None, **kwargs):
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, using=using, **kwargs)
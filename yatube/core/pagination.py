@@ -0,0 +1,208 @@
+import heapq
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def encode_cursor(obj, direction=FORWARD) -> str:
+    """Кодирует позицию записи (pub_date, pk) в непрозрачный токен."""
+    position = f'{direction}|{obj.pub_date.isoformat()}|{obj.pk}'
+    return urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """Раскодирует токен в кортеж (направление, pub_date, pk)."""
+    try:
+        direction, pub_date, pk = (
+            urlsafe_b64decode(cursor.encode()).decode().split('|')
+        )
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (BinasciiError, UnicodeError, ValueError):
+        raise InvalidCursor('Некорректный курсор')
+    if direction not in (FORWARD, BACKWARD) or pub_date is None:
+        raise InvalidCursor('Некорректный курсор')
+    return direction, pub_date, pk
+
+
+def next_cursor(page):
+    """Курсор на страницу, следующую за последней записью page."""
+    if not len(page):
+        return None
+    return encode_cursor(page[len(page) - 1], FORWARD)
+
+
+def previous_cursor(page):
+    """Курсор на страницу, предшествующую первой записи page."""
+    if not len(page):
+        return None
+    return encode_cursor(page[0], BACKWARD)
+
+
+class CursorPage(Page):
+    """Страница, полученная по курсору, без подсчёта общего числа записей."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+
+def page_state(page) -> tuple:
+    """Страница в виде для кэша: записи и положение в ленте без запроса."""
+    count = page.paginator.count if page.number else None
+    return (
+        list(page.object_list),
+        page.number,
+        count,
+        page.has_next(),
+        page.has_previous(),
+    )
+
+
+def restore_page(paginator, state) -> Page:
+    """Восстанавливает страницу, сохранённую page_state, не читая базу."""
+    posts, number, count, has_next, has_previous = state
+    if number is None:
+        return CursorPage(posts, paginator, has_next, has_previous)
+    paginator.count = count
+    return paginator._get_page(posts, number, paginator)
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, pk).
+
+    Первую страницу и страницы по курсору выбирает одним запросом по
+    индексу без COUNT(*) и OFFSET. Номера страниц тоже поддерживаются,
+    но только когда номер запрошен явно. Поля ключа можно
+    заменить на аннотации с теми же значениями, чтобы сортировка шла по
+    индексу другой таблицы.
+    """
+
+    def __init__(
+        self,
+        object_list,
+        per_page,
+        date_field='pub_date',
+        pk_field='pk',
+        **kwargs,
+    ):
+        self.date_field = date_field
+        self.pk_field = pk_field
+        super().__init__(
+            object_list.order_by(f'-{date_field}', f'-{pk_field}'),
+            per_page,
+            **kwargs,
+        )
+
+    def _after(self, pub_date, pk, lookup):
+        return Q(**{f'{self.date_field}__{lookup}': pub_date}) | Q(
+            **{self.date_field: pub_date, f'{self.pk_field}__{lookup}': pk}
+        )
+
+    def fetch(self, direction=FORWARD, pub_date=None, pk=None) -> list:
+        """Возвращает per_page + 1 записей за позицией в порядке обхода."""
+        posts = self.object_list
+        if direction == BACKWARD:
+            posts = posts.order_by(self.date_field, self.pk_field)
+        if pub_date is not None:
+            lookup = 'lt' if direction == FORWARD else 'gt'
+            posts = posts.filter(self._after(pub_date, pk, lookup))
+        return list(posts[:self.per_page + 1])
+
+    def _cursor_page(self, posts, direction, has_previous=True):
+        has_more = len(posts) > self.per_page
+        posts = posts[:self.per_page]
+
+        if direction == FORWARD:
+            has_previous = has_previous and bool(posts)
+            return CursorPage(posts, self, has_more, has_previous)
+        if not has_more:
+            return self.first_page()
+        return CursorPage(posts[::-1], self, True, True)
+
+    def first_page(self) -> Page:
+        """Первая страница одним запросом, без подсчёта записей.
+
+        Если все записи поместились на страницу, их число известно,
+        и возвращается обычная страница номер 1.
+        """
+        posts = self.fetch()
+        if len(posts) > self.per_page:
+            return self._cursor_page(posts, FORWARD, has_previous=False)
+        self.count = len(posts)
+        return self._get_page(posts, 1, self)
+
+    def cursor_page(self, cursor: str) -> CursorPage:
+        """Возвращает страницу по курсору или бросает InvalidCursor."""
+        direction, pub_date, pk = decode_cursor(cursor)
+        return self._cursor_page(
+            self.fetch(direction, pub_date, pk), direction
+        )
+
+    def get_cursor_page(self, cursor: str) -> Page:
+        """Возвращает страницу по курсору, при ошибке – первую страницу."""
+        try:
+            return self.cursor_page(cursor)
+        except InvalidCursor:
+            return self.first_page()
+
+
+def _position(obj):
+    return obj.pub_date, obj.pk
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Пагинатор по k-way слиянию нескольких лент с общим ключом.
+
+    Каждая лента задаётся своим CursorPaginator и читается по собственному
+    индексу, записи с одинаковым pk выводятся один раз. Номера страниц не
+    поддерживаются: любая страница по номеру – первая.
+    """
+
+    def __init__(self, paginators, per_page):
+        super(CursorPaginator, self).__init__([], per_page)
+        self.paginators = paginators
+
+    def fetch(self, direction=FORWARD, pub_date=None, pk=None) -> list:
+        streams = [
+            paginator.fetch(direction, pub_date, pk)
+            for paginator in self.paginators
+        ]
+        merged = heapq.merge(
+            *streams, key=_position, reverse=direction == FORWARD
+        )
+        posts, seen = [], set()
+        for post in merged:
+            if post.pk in seen:
+                continue
+            seen.add(post.pk)
+            posts.append(post)
+            if len(posts) > self.per_page:
+                break
+        return posts
+
+    def page(self, number):
+        return self.first_page()
+
+    def get_page(self, number):
+        return self.page(number)
@@ -0,0 +1,213 @@
+"""Профилирование запросов: SQL и отрисовка шаблонов.
+
+ProfilingMiddleware включается настройкой PROFILING. Для каждого запроса
+она собирает SQL-запросы через execute_wrapper и время отрисовки каждого
+шаблона, включая подключённые через include, отдаёт итог в заголовке
+Server-Timing, пишет строку JSON в журнал core.profiling, а сотрудникам
+добавляет в конец HTML-страницы панель с подробностями.
+
+Одинаковые запросы, выполненные из одного шаблона не меньше
+PROFILING_DUPLICATE_THRESHOLD раз, отмечаются как повторы: обычно это
+N+1, например обращение к post.author в цикле includes/post.html.
+"""
+import json
+import logging
+import threading
+from collections import Counter
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+from django.template.loader import render_to_string
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_TEMPLATES = 5
+SQL_PREVIEW_LENGTH = 200
+
+_local = threading.local()
+_render = Template.render
+
+
+def _profiled_render(self, context):
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        return _render(self, context)
+    return profile.render(self, context)
+
+
+def install_template_hook():
+    """Подменяет Template.render версией, которая пишет время в профиль
+    текущего запроса. Вне профилируемого запроса вызывается исходный метод.
+    """
+    Template.render = _profiled_render
+
+
+class RequestProfile:
+    """Замеры одного запроса.
+
+    Время шаблона включает время вложенных в него шаблонов, render_time –
+    время только шаблонов верхнего уровня.
+    """
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.total = None
+        self.queries = []
+        self.templates = {}
+        self.render_time = 0
+        self._stack = []
+
+    def execute(self, execute, sql, params, many, context):
+        """execute_wrapper: запоминает запрос, время и текущий шаблон."""
+        template = self._stack[-1] if self._stack else None
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, perf_counter() - started, template))
+
+    def render(self, template, context):
+        name = template.name or '<string>'
+        self._stack.append(name)
+        started = perf_counter()
+        try:
+            return _render(template, context)
+        finally:
+            elapsed = perf_counter() - started
+            self._stack.pop()
+            count, spent = self.templates.get(name, (0, 0))
+            self.templates[name] = (count + 1, spent + elapsed)
+            if not self._stack:
+                self.render_time += elapsed
+
+    def finish(self):
+        self.total = perf_counter() - self.started
+
+    @property
+    def sql_time(self):
+        return sum(duration for _, duration, _ in self.queries)
+
+    def duplicates(self, threshold=None):
+        """Повторы: (SQL, шаблон, число выполнений) по убыванию числа."""
+        if threshold is None:
+            threshold = settings.PROFILING_DUPLICATE_THRESHOLD
+        counts = Counter((sql, template) for sql, _, template in self.queries)
+        return [
+            (sql, template, count)
+            for (sql, template), count in counts.most_common()
+            if count >= threshold
+        ]
+
+    def slowest_templates(self, limit=None):
+        """(имя, число отрисовок, секунды) по убыванию времени."""
+        templates = sorted(
+            self.templates.items(), key=lambda item: item[1][1], reverse=True
+        )
+        return [
+            (name, count, spent) for name, (count, spent) in templates[:limit]
+        ]
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing."""
+        metrics = [
+            f'total;dur={self.total * 1000:.2f}',
+            f'sql;dur={self.sql_time * 1000:.2f};'
+            f'desc="{len(self.queries)} queries"',
+            f'render;dur={self.render_time * 1000:.2f}',
+        ]
+        for number, (name, count, spent) in enumerate(
+            self.slowest_templates(SERVER_TIMING_TEMPLATES), start=1
+        ):
+            metrics.append(
+                f'tpl{number};dur={spent * 1000:.2f};desc="{name} x{count}"'
+            )
+        duplicates = self.duplicates()
+        if duplicates:
+            metrics.append(f'dup;desc="{len(duplicates)} repeated queries"')
+        return ', '.join(metrics)
+
+    def summary(self, request, response):
+        """Итог запроса для журнала и панели."""
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(self.total * 1000, 2),
+            'queries': len(self.queries),
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'render_ms': round(self.render_time * 1000, 2),
+            'templates': [
+                {'name': name, 'count': count, 'ms': round(spent * 1000, 2)}
+                for name, count, spent in self.slowest_templates()
+            ],
+            'duplicates': [
+                {
+                    'sql': sql[:SQL_PREVIEW_LENGTH],
+                    'template': template,
+                    'count': count,
+                }
+                for sql, template, count in self.duplicates()
+            ],
+        }
+
+
+class ProfilingMiddleware:
+    """Профилирует каждый запрос, если PROFILING включён.
+
+    Должна стоять первой в MIDDLEWARE, чтобы учесть запросы остальных
+    промежуточных слоёв.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING:
+            raise MiddlewareNotUsed
+        install_template_hook()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        _local.profile = profile
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        profile.finish()
+
+        summary = profile.summary(request, response)
+        response['Server-Timing'] = profile.server_timing()
+        logger.info(json.dumps(summary, ensure_ascii=False))
+        if self.show_panel(request, response):
+            self.add_panel(response, summary)
+        return response
+
+    def show_panel(self, request, response):
+        user = getattr(request, 'user', None)
+        return (
+            user is not None
+            and user.is_staff
+            and not response.streaming
+            and response.get('Content-Type', '').startswith('text/html')
+        )
+
+    def add_panel(self, response, summary):
+        content = response.content.decode(response.charset)
+        position = content.rfind('</body>')
+        if position == -1:
+            return
+        panel = render_to_string(
+            'core/profiling_panel.html', {'profile': summary}
+        )
+        response.content = content[:position] + panel + content[position:]
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = len(response.content)
@@ -0,0 +1,87 @@
+"""Чтение с реплик базы данных.
+
+ReplicaMiddleware отмечает запросы GET и HEAD к адресам из REPLICA_VIEWS,
+и ReplicaRouter отправляет чтения таких запросов на случайную реплику из
+REPLICA_DATABASES. Запись всегда идёт в default.
+
+Чтобы пользователь сразу видел свои изменения, после запроса с записью
+ставится cookie REPLICA_PIN_COOKIE на REPLICA_PIN_SECONDS – время, за
+которое реплики успевают догнать основную базу. Пока cookie есть, все
+чтения этого пользователя идут в default.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+
+def _replicas_allowed():
+    return getattr(_state, 'use_replica', False) and not getattr(
+        _state, 'wrote', False
+    )
+
+
+class ReplicaRouter:
+    """Чтения отмеченных запросов – на реплики, остальное – в default."""
+
+    def db_for_read(self, model, **hints):
+        if not _replicas_allowed():
+            return None
+        # Внутри транзакции читаем то, что она уже записала.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Включает чтение с реплик для запросов к REPLICA_VIEWS.
+
+    Должна стоять до SessionMiddleware, чтобы видеть запись сессии.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.use_replica = _state.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.use_replica = False
+        if _state.wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _state.use_replica = (
+            request.method in ('GET', 'HEAD')
+            and request.resolver_match.view_name in settings.REPLICA_VIEWS
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+        )
@@ -0,0 +1,134 @@
+"""Выборочный профилировщик для рабочего трафика.
+
+Фоновый поток раз в SAMPLING_PROFILER_INTERVAL секунд снимает стеки
+потоков, которые сейчас обрабатывают запросы, и считает одинаковые стеки
+отдельно для каждого имени адреса (view_name). Сами запросы ничего не
+замеряют, поэтому накладные расходы зависят только от частоты выборки.
+
+Итог выдаётся в свёрнутом формате flamegraph.pl и speedscope: строка
+«адрес;функция;...;функция число_выборок». Данные хранятся в памяти
+процесса, у каждого процесса сервера они свои.
+"""
+import sys
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.handlers.wsgi import get_path_info
+from django.urls import Resolver404, resolve
+
+MAX_DEPTH = 200
+UNRESOLVED = '<unresolved>'
+
+profiler = None
+
+
+def view_name(environ):
+    """Имя адреса запроса, который обработает Django."""
+    try:
+        return resolve(get_path_info(environ)).view_name
+    except Resolver404:
+        return UNRESOLVED
+
+
+class SamplingProfiler:
+    """Снимает стеки отмеченных потоков через равные промежутки времени."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._active = {}
+        self._samples = defaultdict(Counter)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='sampling-profiler', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def enter(self, label, root):
+        """Отмечает текущий поток: стек выше кадра root относится к label."""
+        self._active[threading.get_ident()] = (label, root)
+
+    def leave(self):
+        self._active.pop(threading.get_ident(), None)
+
+    def sample(self):
+        """Снимает по одному стеку с каждого отмеченного потока."""
+        frames = sys._current_frames()
+        for thread_id, (label, root) in list(self._active.items()):
+            frame = frames.get(thread_id)
+            stack = []
+            while (
+                frame is not None
+                and frame is not root
+                and len(stack) < MAX_DEPTH
+            ):
+                module = frame.f_globals.get('__name__', '?')
+                stack.append(f'{module}:{frame.f_code.co_name}')
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                with self._lock:
+                    self._samples[label][';'.join(stack)] += 1
+
+    def collapsed(self, label=None):
+        """Строки свёрнутых стеков, первым кадром идёт имя адреса."""
+        with self._lock:
+            samples = {
+                name: dict(stacks)
+                for name, stacks in self._samples.items()
+                if label is None or name == label
+            }
+        return [
+            f'{name};{stack} {count}'
+            for name, stacks in sorted(samples.items())
+            for stack, count in sorted(stacks.items())
+        ]
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+class ProfiledApplication:
+    """WSGI-приложение, запросы которого видит профилировщик."""
+
+    def __init__(self, application, profiler):
+        self.application = application
+        self.profiler = profiler
+
+    def __call__(self, environ, start_response):
+        self.profiler.enter(view_name(environ), sys._getframe())
+        try:
+            return self.application(environ, start_response)
+        finally:
+            self.profiler.leave()
+
+
+def profile_application(application):
+    """Оборачивает приложение и запускает профилировщик, если включён
+    SAMPLING_PROFILER, иначе возвращает приложение как есть.
+    """
+    global profiler
+    if not settings.SAMPLING_PROFILER:
+        return application
+    profiler = SamplingProfiler(settings.SAMPLING_PROFILER_INTERVAL)
+    profiler.start()
+    return ProfiledApplication(application, profiler)
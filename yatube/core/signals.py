@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Настраивает новое соединение SQLite прагмами из SQLITE_PRAGMAS.
+
+    WAL позволяет читать во время записи, а busy_timeout заставляет
+    писателя подождать освобождения базы вместо ошибки
+    «database is locked».
+    """
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    """Закрывает постоянные соединения, которые перестали отвечать.
+
+    Проверяются соединения с HEALTH_CHECKS в настройках базы; закрытое
+    соединение откроется заново при первом запросе к базе.
+    """
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and connection.settings_dict.get('HEALTH_CHECKS')
+            and not connection.is_usable()
+        ):
+            connection.close()
@@ -0,0 +1,8 @@
+from django import template
+
+from core.pagination import next_cursor, previous_cursor
+
+register = template.Library()
+
+register.filter(next_cursor)
+register.filter(previous_cursor)
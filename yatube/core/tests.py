@@ -1,4 +1,25 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from importlib.util import find_spec
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.utils import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics, replicas, sampling
+from core.backends.postgresql_pool.pool import BlockingPool
+from core.signals import check_connections
+from core.utils import require_packages
+from posts.models import Comment, Post
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +27,445 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class TwoLevelCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shared = caches['shared']
+
+    def test_values_are_written_to_shared_cache(self):
+        """Записанное значение попадает в общий кэш."""
+        cache.set('key', 'value')
+
+        self.assertEqual(self.shared.get('key'), 'value')
+
+    def test_local_cache_serves_hits(self):
+        """Повторное чтение обслуживается локальным кэшем."""
+        self.shared.set('key', 'value')
+        self.assertEqual(cache.get('key'), 'value')
+
+        self.shared.delete('key')
+
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache.get_many(['key']), {'key': 'value'})
+
+    def test_incr_and_delete_drop_local_copy(self):
+        """incr и delete не оставляют устаревшей локальной копии."""
+        cache.set('counter', 1)
+        self.assertEqual(cache.incr('counter'), 2)
+        self.assertEqual(cache.get('counter'), 2)
+
+        cache.delete('counter')
+
+        self.assertIsNone(cache.get('counter'))
+        self.assertIsNone(self.shared.get('counter'))
+
+
+@override_settings(PROFILING=True)
+class ProfilingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Текст')
+        for number in range(4):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader{number}'),
+                text='Комментарий',
+            )
+        cls.url = reverse('posts:post_detail', args=(cls.post.pk,))
+
+    def comments_without_authors(self):
+        """Комментарии без select_related: автор каждого – запросом."""
+        return mock.patch(
+            'posts.views._get_comments_page',
+            lambda request, post_id, parameter: list(
+                Comment.objects.filter(post_id=post_id)
+            ),
+        )
+
+    def get(self, user=None):
+        if user is not None:
+            self.client.force_login(user)
+        with self.assertLogs('core.profiling') as logs:
+            response = self.client.get(self.url)
+        return response, json.loads(logs.records[0].getMessage())
+
+    def test_server_timing_and_log(self):
+        """Итог запроса попадает в Server-Timing и журнал."""
+        response, summary = self.get()
+
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        self.assertIn('posts/post_detail.html x1', response['Server-Timing'])
+        self.assertEqual(summary['view'], 'posts:post_detail')
+        self.assertGreater(summary['queries'], 0)
+        self.assertIn(
+            'posts/post_detail.html',
+            [template['name'] for template in summary['templates']],
+        )
+
+    def test_repeated_queries_are_reported(self):
+        """Запрос автора в цикле по комментариям отмечается как повтор."""
+        with self.comments_without_authors():
+            response, summary = self.get()
+
+        self.assertIn('dup;', response['Server-Timing'])
+        duplicate = summary['duplicates'][0]
+        self.assertEqual(duplicate['template'], 'includes/comments.html')
+        self.assertEqual(duplicate['count'], 4)
+        self.assertIn('auth_user', duplicate['sql'])
+
+    def test_panel_is_shown_to_staff_only(self):
+        """Панель добавляется в страницу только сотрудникам."""
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        with self.comments_without_authors():
+            response, _ = self.get()
+            self.assertNotContains(response, 'Повторяющиеся запросы')
+
+            response, _ = self.get(staff)
+            self.assertContains(response, 'Повторяющиеся запросы')
+
+    @override_settings(PROFILING=False)
+    def test_disabled_by_default(self):
+        """Без PROFILING заголовок не добавляется."""
+        response = self.client.get(self.url)
+
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+def busy_application(environ, start_response):
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+    start_response('200 OK', [])
+    return [b'']
+
+
+class SamplingProfilerTest(TestCase):
+    def setUp(self):
+        self.profiler = sampling.SamplingProfiler(interval=0.001)
+        self.application = sampling.ProfiledApplication(
+            busy_application, self.profiler
+        )
+
+    def test_stacks_are_grouped_by_view_name(self):
+        """Стеки запроса собираются под именем его адреса."""
+        self.profiler.start()
+        try:
+            self.application({'PATH_INFO': '/'}, lambda *args: None)
+            self.application({'PATH_INFO': '/missing/'}, lambda *args: None)
+        finally:
+            self.profiler.stop()
+
+        lines = self.profiler.collapsed()
+        self.assertTrue(lines)
+        self.assertTrue(all(
+            line.startswith(('posts:index;', '<unresolved>;'))
+            for line in lines
+        ))
+        index = self.profiler.collapsed('posts:index')
+        self.assertIn('core.tests:busy_application', index[0])
+        self.assertGreater(int(index[0].rsplit(' ', 1)[1]), 0)
+
+    def test_stacks_endpoint_is_staff_only(self):
+        """Стеки отдаются только сотрудникам."""
+        self.profiler.enter('posts:index', None)
+        self.profiler.sample()
+        self.profiler.leave()
+        url = reverse('sampled_stacks')
+        sampling.profiler = self.profiler
+        self.addCleanup(setattr, sampling, 'profiler', None)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        response = self.client.get(url, {'view': 'posts:index'})
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertTrue(response.content.decode().startswith('posts:index;'))
+
+        self.client.post(url)
+        self.assertEqual(self.profiler.collapsed(), [])
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.addCleanup(metrics.REGISTRY.pop, 'test_total', None)
+        self.addCleanup(metrics.REGISTRY.pop, 'test_seconds', None)
+
+    def test_counter_sums_values_of_all_threads(self):
+        """Значения, записанные в разных потоках, складываются."""
+        counter = metrics.Counter('test_total', 'Тест', ('kind',))
+
+        def work():
+            for _ in range(1000):
+                counter.inc(kind='a')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc(2, kind='b')
+
+        self.assertEqual(counter.values(), {('a',): 4000, ('b',): 2})
+        self.assertIn('test_total{kind="a"} 4000', metrics.expose())
+
+    def test_histogram_exposition(self):
+        """Корзины гистограммы накопительные, есть сумма и число."""
+        histogram = metrics.Histogram(
+            'test_seconds', 'Тест', ('view',), buckets=(0.1, 1)
+        )
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, view='posts:index')
+
+        self.assertEqual(histogram.samples(), [
+            'test_seconds_bucket{view="posts:index",le="0.1"} 1',
+            'test_seconds_bucket{view="posts:index",le="1"} 2',
+            'test_seconds_bucket{view="posts:index",le="+Inf"} 3',
+            'test_seconds_sum{view="posts:index"} 5.55',
+            'test_seconds_count{view="posts:index"} 3',
+        ])
+
+    def test_requests_and_cache_are_counted(self):
+        """Запросы считаются по именам адресов, чтения фрагментов – по
+        имени фрагмента.
+        """
+        cache.clear()
+        requests = metrics.REQUESTS.values()
+        key = ('posts:index', 'GET', 200)
+        misses = metrics.CACHE_REQUESTS.values().get(('index_page', 'miss'))
+
+        self.client.get(reverse('posts:index'))
+
+        self.assertEqual(
+            metrics.REQUESTS.values()[key], requests.get(key, 0) + 1
+        )
+        self.assertEqual(
+            metrics.CACHE_REQUESTS.values()[('index_page', 'miss')],
+            (misses or 0) + 1,
+        )
+        self.assertIn(
+            ('posts:index',), metrics.REQUEST_QUERIES.values()
+        )
+
+    def test_created_objects_are_counted(self):
+        """Регистрации, посты и комментарии попадают в счётчик."""
+        created = metrics.REGISTRY['yatube_objects_created_total']
+        before = created.values()
+
+        user = User.objects.create_user(username='writer')
+        Post.objects.create(author=user, text='Текст')
+
+        after = created.values()
+        for model in ('user', 'post'):
+            self.assertEqual(
+                after[(model,)], before.get((model,), 0) + 1
+            )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_requires_token(self):
+        """С METRICS_TOKEN метрики отдаются только с токеном."""
+        url = reverse('metrics')
+
+        self.assertEqual(self.client.get(url).status_code, 401)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertContains(response, '# TYPE yatube_http_requests_total')
+
+
+class DatabaseConnectionTest(TestCase):
+    def test_sqlite_pragmas_are_applied(self):
+        """Новое соединение SQLite получает прагмы из SQLITE_PRAGMAS."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_unusable_connection_is_closed(self):
+        """Неработающее постоянное соединение закрывается в начале запроса."""
+        connection.ensure_connection()
+        settings_dict = {**connection.settings_dict, 'HEALTH_CHECKS': True}
+
+        with mock.patch.object(connection, 'settings_dict', settings_dict):
+            with mock.patch.object(connection, 'is_usable', return_value=True):
+                with mock.patch.object(connection, 'close') as close:
+                    check_connections()
+                    close.assert_not_called()
+            with mock.patch.object(
+                connection, 'is_usable', return_value=False
+            ):
+                with mock.patch.object(connection, 'close') as close:
+                    check_connections()
+                    close.assert_called_once()
+
+
+class ConnectionPoolTest(TestCase):
+    def make_pool(self, timeout=0.05):
+        self.pool = mock.Mock()
+        self.pool.getconn.side_effect = lambda: object()
+        return BlockingPool(self.pool, 1, timeout)
+
+    def test_returned_connection_is_reused(self):
+        """Возвращённое в пул соединение снова можно взять."""
+        pool = self.make_pool()
+        first = pool.getconn()
+        pool.putconn(first)
+
+        pool.getconn()
+        self.pool.putconn.assert_called_once_with(first, close=False)
+
+    def test_exhausted_pool_waits(self):
+        """Когда соединения заняты, поток ждёт, пока одно не вернут."""
+        pool = self.make_pool(timeout=5)
+        taken = pool.getconn()
+        timer = threading.Timer(0.05, pool.putconn, (taken,))
+        timer.start()
+
+        pool.getconn()
+        timer.join()
+        self.pool.putconn.assert_called_once_with(taken, close=False)
+
+    def test_exhausted_pool_times_out(self):
+        """Если соединение так и не вернули, запрос получает ошибку базы."""
+        pool = self.make_pool()
+        pool.getconn()
+
+        with self.assertRaises(OperationalError):
+            pool.getconn()
+
+    def test_failed_checkout_frees_slot(self):
+        """Ошибка подключения не занимает место в пуле."""
+        pool = self.make_pool()
+        self.pool.getconn.side_effect = [OperationalError, object()]
+
+        with self.assertRaises(OperationalError):
+            pool.getconn()
+        pool.getconn()
+
+    @skipUnless(find_spec('psycopg2'), 'нужен psycopg2')
+    def test_close_returns_connection_to_pool(self):
+        """DatabaseWrapper берёт соединение из пула и при закрытии
+        возвращает его.
+        """
+        from core.backends.postgresql_pool import base
+
+        pool = self.make_pool()
+        self.pool.getconn.side_effect = None
+        self.pool.getconn.return_value.closed = 0
+        wrapper = base.DatabaseWrapper({'OPTIONS': {}}, alias='pooled')
+
+        with mock.patch.dict(base._pools, {'pooled': pool}):
+            wrapper.connection = wrapper.get_new_connection({})
+            with self.assertRaises(OperationalError):
+                wrapper.get_new_connection({})
+            wrapper._close()
+            wrapper.get_new_connection({})
+
+        self.pool.putconn.assert_called_once_with(
+            self.pool.getconn.return_value, close=False
+        )
+
+
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = replicas.ReplicaRouter()
+        self.addCleanup(vars(replicas._state).clear)
+
+    @override_settings(REPLICA_DATABASES=['replica'])
+    def test_reads_of_marked_requests_go_to_replica(self):
+        """Отмеченный запрос читает с реплики, пока не было записи."""
+        replicas._state.use_replica = True
+        replicas._state.wrote = False
+
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertIsNone(self.router.db_for_read(Post))
+
+    @override_settings(REPLICA_DATABASES=['replica'])
+    def test_reads_inside_transaction_stay_on_default(self):
+        """Внутри транзакции чтения идут в default."""
+        replicas._state.use_replica = True
+        replicas._state.wrote = False
+
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    @override_settings(REPLICA_DATABASES=['replica'])
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+        self.assertIsNone(self.router.allow_migrate('default', 'posts'))
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='Текст')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.client.cookies.pop(settings.REPLICA_PIN_COOKIE, None)
+
+    def request(self, method, url, **kwargs):
+        """Выполняет запрос и возвращает, разрешал ли роутер реплики.
+
+        Сами чтения остаются в default: реплики в тестах нет.
+        """
+        allowed = []
+        original = replicas._replicas_allowed
+
+        def spy():
+            allowed.append(original())
+            return False
+
+        with mock.patch.object(replicas, '_replicas_allowed', spy):
+            response = getattr(self.client, method)(url, **kwargs)
+        return response, any(allowed)
+
+    def test_read_views_use_replicas(self):
+        """Страницы из REPLICA_VIEWS читают с реплик, остальные – нет."""
+        _, allowed = self.request('get', reverse('posts:index'))
+        self.assertTrue(allowed)
+
+        _, allowed = self.request('get', reverse('posts:post_create'))
+        self.assertFalse(allowed)
+
+    def test_write_pins_user_to_default(self):
+        """После своей записи пользователь читает из default."""
+        response, _ = self.request(
+            'post',
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            data={'text': 'Комментарий'},
+        )
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+
+        _, allowed = self.request(
+            'get', reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        self.assertFalse(allowed)
+
+
+class RequirePackagesTest(TestCase):
+    def test_missing_package(self):
+        """Бэкенд без установленного пакета – ошибка настройки
+        с именем пакета.
+        """
+        with mock.patch('core.utils.find_spec', return_value=None):
+            require_packages('sqlite', 'file')
+            for backend, package in (
+                ('postgresql_pool', 'psycopg2-binary'),
+                ('memcached', 'python-memcached'),
+                ('redis', 'django-redis'),
+            ):
+                with self.subTest(backend=backend):
+                    with self.assertRaisesMessage(
+                        ImproperlyConfigured, package
+                    ):
+                        require_packages('sqlite', backend)
@@ -0,0 +1,39 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class OversizedUploadedFile(UploadedFile):
+    """Файл, загрузка которого прервана из-за превышения размера."""
+
+    def __init__(self, name, content_type, size, charset):
+        super().__init__(BytesIO(), name, content_type, size, charset)
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """Не пропускает дальше данные файла больше MAX_UPLOAD_SIZE.
+
+    Обработчик должен стоять первым в FILE_UPLOAD_HANDLERS. Остаток такого
+    файла не попадает ни в память, ни на диск, а вместо него в request.FILES
+    оказывается пустой OversizedUploadedFile с настоящим размером, чтобы
+    форма могла сообщить об ошибке.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.MAX_UPLOAD_SIZE:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received <= settings.MAX_UPLOAD_SIZE:
+            return None
+        return OversizedUploadedFile(
+            self.file_name, self.content_type, self.received, self.charset
+        )
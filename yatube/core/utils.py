@@ -0,0 +1,37 @@
+from importlib.util import find_spec
+from itertools import islice
+
+from django.core.exceptions import ImproperlyConfigured
+
+# Пакеты необязательных бэкендов базы и кэша: (модуль, пакет в PyPI).
+OPTIONAL_PACKAGES = {
+    'postgresql': ('psycopg2', 'psycopg2-binary'),
+    'postgresql_pool': ('psycopg2', 'psycopg2-binary'),
+    'memcached': ('memcache', 'python-memcached'),
+    'redis': ('django_redis', 'django-redis'),
+}
+
+
+def batches(iterable, size):
+    """Разбивает итерируемый объект на списки не длиннее size."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def require_packages(*backends):
+    """Проверяет, что установлены пакеты выбранных бэкендов.
+
+    Без проверки отсутствие пакета обнаружилось бы только при первом
+    обращении к базе или кэшу.
+    """
+    for backend in backends:
+        module, package = OPTIONAL_PACKAGES.get(backend, (None, None))
+        if module and find_spec(module) is None:
+            raise ImproperlyConfigured(
+                f'Для {backend} нужен пакет {package}, он указан '
+                f'в requirements-optional.txt.'
+            )
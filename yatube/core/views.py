@@ -1,4 +1,11 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_http_methods
+
+from . import metrics, sampling
 
 
 def page_not_found(request, exception):
@@ -15,3 +22,33 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+@require_http_methods(['GET', 'POST'])
+def sampled_stacks(request):
+    """Свёрнутые стеки профилировщика, ?view= оставляет один адрес.
+
+    POST сбрасывает накопленные выборки.
+    """
+    profiler = sampling.profiler
+    if profiler is None:
+        raise Http404('Профилировщик не запущен')
+    if request.method == 'POST':
+        profiler.reset()
+        return HttpResponse(status=204)
+    lines = profiler.collapsed(request.GET.get('view'))
+    return HttpResponse(
+        ''.join(f'{line}\n' for line in lines),
+        content_type='text/plain; charset=utf-8',
+    )
+
+
+def prometheus_metrics(request):
+    """Метрики процесса, с METRICS_TOKEN – только с этим токеном."""
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.expose(), content_type=metrics.CONTENT_TYPE)
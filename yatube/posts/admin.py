@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Comment, Group, Post
 
 
@@ -16,6 +17,11 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -45,6 +51,14 @@ class CommentAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
 
+    def get_search_results(self, request, queryset, search_term):
+        if search_term:
+            # Комментарии ищутся только у постов, найденных по индексу.
+            queryset = queryset.filter(
+                post__in=search.filter_posts(Post.objects.all(), search_term)
+            )
+        return super().get_search_results(request, queryset, search_term)
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
@@ -0,0 +1,221 @@
+"""Анализ текста для поискового индекса.
+
+Анализатор – цепочка: нормализация текста, разбиение на слова и фильтры,
+каждый из которых получает и возвращает последовательность термов.
+Один и тот же анализатор разбирает и документы, и запросы, поэтому после
+смены SEARCH_ANALYZER индекс нужно пересобрать.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+MAX_TERM_LENGTH = 64
+TOKEN_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile(r'[а-я]+')
+
+STOP_WORDS = frozenset(
+    'а без более бы был была были было быть в вам вас весь во вот все '
+    'всего всех вы где да даже для до его ее ей ему если есть еще же за '
+    'здесь и из или им их к как ко когда кто ли либо между меня мне может '
+    'мы на над надо наш не него нее нет ни них но ну о об однако он она '
+    'они оно от очень по под при с со так также такой там те тем то того '
+    'тоже той только том ты у уже хотя чего чей чем что чтобы чье чья эта '
+    'эти это этого этой этом этот я'.split()
+)
+
+
+def normalize(text: str) -> str:
+    """Нижний регистр, составные символы Юникода, ё → е, без ударений."""
+    text = unicodedata.normalize('NFC', text.lower())
+    return text.replace('ё', 'е').replace('\u0301', '')
+
+
+def tokenize(text: str) -> list:
+    """Слова из букв, цифр и подчёркиваний не длиннее MAX_TERM_LENGTH."""
+    return [
+        token
+        for token in TOKEN_RE.findall(text)
+        if len(token) <= MAX_TERM_LENGTH
+    ]
+
+
+# Окончания русского стеммера Snowball. Окончания первой группы отрезаются,
+# только если перед ними стоит «а» или «я».
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    (
+        'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+        'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую',
+        'юю', 'ая', 'яя', 'ою', 'ею',
+    ),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = (
+    (),
+    (
+        'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+        'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+        'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+        'ья', 'я',
+    ),
+)
+SUPERLATIVE = ((), ('ейш', 'ейше'))
+DERIVATIONAL = ((), ('ост', 'ость'))
+VOWELS = frozenset('аеиоуыэюя')
+
+
+def _regions(word):
+    """Начала областей RV и R2 слова по правилам Snowball."""
+    rv = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    r1 = len(word)
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _remove(word, start, endings):
+    """Отрезает самое длинное окончание, лежащее в области от start.
+
+    Возвращает None, если окончания нет или для окончания первой группы
+    перед ним не стоит «а» или «я».
+    """
+    after_a, plain = endings
+    found = max(
+        (
+            ending
+            for ending in after_a + plain
+            if word.endswith(ending) and len(word) - len(ending) >= start
+        ),
+        key=len,
+        default=None,
+    )
+    if found is None:
+        return None
+    stem = word[:-len(found)]
+    if found in after_a and (len(stem) <= start or stem[-1] not in 'ая'):
+        return None
+    return stem
+
+
+@lru_cache(maxsize=100_000)
+def stem(word: str) -> str:
+    """Основа русского слова по алгоритму Snowball."""
+    rv, r2 = _regions(word)
+
+    result = _remove(word, rv, PERFECTIVE_GERUND)
+    if result is None:
+        word = _remove(word, rv, REFLEXIVE) or word
+        result = _remove(word, rv, ADJECTIVE)
+        if result is not None:
+            result = _remove(result, rv, PARTICIPLE) or result
+        else:
+            result = _remove(word, rv, VERB)
+            if result is None:
+                result = _remove(word, rv, NOUN)
+    word = word if result is None else result
+
+    if word.endswith('и') and len(word) > rv:
+        word = word[:-1]
+    word = _remove(word, r2, DERIVATIONAL) or word
+
+    superlative = _remove(word, rv, SUPERLATIVE)
+    if superlative is not None:
+        word = superlative
+    if word.endswith('нн') and len(word) - 1 > rv:
+        word = word[:-1]
+    elif superlative is None and word.endswith('ь') and len(word) > rv:
+        word = word[:-1]
+    return word
+
+
+def remove_stop_words(tokens):
+    """Убирает служебные слова."""
+    return [token for token in tokens if token not in STOP_WORDS]
+
+
+def stem_tokens(tokens):
+    """Заменяет русские слова их основами, остальные оставляет как есть."""
+    return [
+        stem(token) if CYRILLIC_RE.fullmatch(token) else token
+        for token in tokens
+    ]
+
+
+def trigrams(tokens):
+    """Заменяет слова их триграммами, короткие слова оставляет целиком.
+
+    Запрос из части слова находит все слова, которые её содержат, ценой
+    индекса в несколько раз больше.
+    """
+    result = []
+    for token in tokens:
+        if len(token) <= 3:
+            result.append(token)
+        else:
+            result.extend(token[i:i + 3] for i in range(len(token) - 2))
+    return result
+
+
+class Analyzer:
+    """Цепочка анализа: нормализация, разбиение на слова и фильтры."""
+
+    def __init__(self, *filters):
+        self.filters = filters
+
+    def __call__(self, text: str) -> list:
+        tokens = tokenize(normalize(text))
+        for token_filter in self.filters:
+            tokens = token_filter(tokens)
+        return list(tokens)
+
+
+ANALYZERS = {
+    'simple': Analyzer(),
+    'russian': Analyzer(remove_stop_words, stem_tokens),
+    'trigram': Analyzer(trigrams),
+}
+
+
+@lru_cache(maxsize=None)
+def _import_analyzer(path):
+    return import_string(path)
+
+
+def get_analyzer(name=None):
+    """Анализатор по имени из ANALYZERS или пути к вызываемому объекту."""
+    name = name or settings.SEARCH_ANALYZER
+    if name in ANALYZERS:
+        return ANALYZERS[name]
+    return _import_analyzer(name)
@@ -0,0 +1,238 @@
+"""Замеры страниц приложения posts на синтетических данных.
+
+Каждый сценарий – один адрес из posts/urls.py, который несколько раз
+запрашивается тестовым клиентом. Для сценария записываются p50 и p95
+времени ответа, число SQL-запросов и время отрисовки шаблона, а затем
+результаты сравниваются с бюджетами из BENCHMARK_BUDGETS.
+"""
+import statistics
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection, reset_queries
+from django.template.backends.django import Template
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import trending
+from .dataset import DatasetGenerator
+from .models import Follow, Group, Post, UserCounters
+
+BENCHMARK_PREFIX = 'bench'
+
+
+def percentile(values, percent):
+    """Перцентиль с линейной интерполяцией, для одного значения – оно само."""
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[
+        percent - 1
+    ]
+
+
+@contextmanager
+def render_timer():
+    """Считает суммарное время отрисовки шаблонов внутри блока.
+
+    Замеряется только отрисовка страницы целиком: вложенные include
+    входят в неё и отдельно не считаются.
+    """
+    spent = []
+    render = Template.render
+
+    def timed_render(self, *args, **kwargs):
+        started = perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            spent.append(perf_counter() - started)
+
+    Template.render = timed_render
+    try:
+        yield spent
+    finally:
+        Template.render = render
+
+
+class Targets:
+    """Объекты сгенерированных данных, на которых запускаются сценарии."""
+
+    def __init__(self):
+        self.group = Group.objects.order_by('-posts_count').first()
+        self.author = (
+            UserCounters.objects.order_by('-posts_count').first().user
+        )
+        self.post = Post.objects.order_by('-comments_count').first()
+        self.viewer = (
+            UserCounters.objects.filter(posts_count__gt=0)
+            .order_by('-following_count')
+            .first()
+            .user
+        )
+        self.own_post = self.viewer.posts.first()
+        self.query = self.post.text.split()[0]
+        self.stranger = (
+            UserCounters.objects.exclude(user=self.viewer)
+            .exclude(user__following__user=self.viewer)
+            .first()
+            .user
+        )
+
+
+class Scenario:
+    """Запрос к одному адресу.
+
+    kwargs и data – функции (targets, номер итерации), которые возвращают
+    аргументы адреса и данные запроса, setup вызывается перед запросом
+    и в замер не входит.
+    """
+
+    def __init__(
+        self,
+        url_name,
+        kwargs=None,
+        method='get',
+        data=None,
+        login=False,
+        setup=None,
+    ):
+        self.url_name = url_name
+        self.kwargs = kwargs
+        self.method = method
+        self.data = data
+        self.login = login
+        self.setup = setup
+
+    def request(self, targets, iteration):
+        if self.setup is not None:
+            self.setup(targets, iteration)
+        kwargs = self.kwargs(targets, iteration) if self.kwargs else None
+        data = self.data(targets, iteration) if self.data else None
+        return reverse(self.url_name, kwargs=kwargs), data
+
+
+def _follow_stranger(targets, iteration):
+    Follow.objects.get_or_create(user=targets.viewer, author=targets.stranger)
+
+
+def _unfollow_stranger(targets, iteration):
+    Follow.objects.filter(
+        user=targets.viewer, author=targets.stranger
+    ).delete()
+
+
+SCENARIOS = {
+    'posts:index': Scenario('posts:index'),
+    'posts:group_list': Scenario(
+        'posts:group_list', kwargs=lambda t, i: {'slug': t.group.slug}
+    ),
+    'posts:profile': Scenario(
+        'posts:profile', kwargs=lambda t, i: {'username': t.author.username}
+    ),
+    'posts:post_detail': Scenario(
+        'posts:post_detail', kwargs=lambda t, i: {'post_id': t.post.pk}
+    ),
+    'posts:comments': Scenario(
+        'posts:comments', kwargs=lambda t, i: {'post_id': t.post.pk}
+    ),
+    'posts:post_edit': Scenario(
+        'posts:post_edit',
+        kwargs=lambda t, i: {'post_id': t.own_post.pk},
+        login=True,
+    ),
+    'posts:post_create': Scenario('posts:post_create', login=True),
+    'posts:add_comment': Scenario(
+        'posts:add_comment',
+        kwargs=lambda t, i: {'post_id': t.post.pk},
+        method='post',
+        data=lambda t, i: {'text': f'Комментарий {i}'},
+        login=True,
+    ),
+    'posts:search': Scenario(
+        'posts:search', data=lambda t, i: {'q': t.query}
+    ),
+    'posts:follow_index': Scenario('posts:follow_index', login=True),
+    'posts:trending': Scenario('posts:trending'),
+    'posts:profile_follow': Scenario(
+        'posts:profile_follow',
+        kwargs=lambda t, i: {'username': t.stranger.username},
+        login=True,
+        setup=_unfollow_stranger,
+    ),
+    'posts:profile_unfollow': Scenario(
+        'posts:profile_unfollow',
+        kwargs=lambda t, i: {'username': t.stranger.username},
+        login=True,
+        setup=_follow_stranger,
+    ),
+}
+
+
+def load_dataset(seed=0, **sizes):
+    """Генерирует данные размера BENCHMARK_DATASET и выбирает цели."""
+    generator = DatasetGenerator(seed=seed, prefix=BENCHMARK_PREFIX)
+    generator.generate(**{**settings.BENCHMARK_DATASET, **sizes})
+    generator.refresh()
+    trending.update()
+    return Targets()
+
+
+def measure(scenario, client, targets, iterations, warmup=1):
+    """Запрашивает адрес warmup + iterations раз и сводит замеры."""
+    timings, renders, queries, statuses = [], [], [], set()
+    for iteration in range(warmup + iterations):
+        url, data = scenario.request(targets, iteration)
+        request = getattr(client, scenario.method)
+        # Журнал запросов ограничен, переполненный CaptureQueriesContext
+        # не видит новых записей.
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            with render_timer() as rendered:
+                started = perf_counter()
+                response = request(url, data)
+                elapsed = perf_counter() - started
+        if iteration < warmup:
+            continue
+        timings.append(elapsed * 1000)
+        renders.append(sum(rendered) * 1000)
+        queries.append(len(captured))
+        statuses.add(response.status_code)
+
+    return {
+        'url': url,
+        'statuses': sorted(statuses),
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'render_p50_ms': round(percentile(renders, 50), 2),
+        'queries': max(queries),
+    }
+
+
+def run(targets, names=None, iterations=20, warmup=1):
+    """Прогоняет сценарии, возвращает результаты по именам адресов."""
+    anonymous, viewer = Client(), Client()
+    viewer.force_login(targets.viewer)
+    results = {}
+    for name in names or SCENARIOS:
+        scenario = SCENARIOS[name]
+        client = viewer if scenario.login else anonymous
+        results[name] = measure(scenario, client, targets, iterations, warmup)
+    return results
+
+
+def check_budgets(results, budgets=None):
+    """Список нарушений бюджетов и ответов с ошибками."""
+    budgets = settings.BENCHMARK_BUDGETS if budgets is None else budgets
+    violations = []
+    for name, result in results.items():
+        errors = [status for status in result['statuses'] if status >= 400]
+        if errors:
+            violations.append(f'{name}: ответы с ошибкой {errors}')
+        for metric, limit in budgets.get(name, {}).items():
+            if result[metric] > limit:
+                violations.append(
+                    f'{name}: {metric} = {result[metric]}, бюджет {limit}'
+                )
+    return violations
@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def _change(queryset, field, delta):
+    """Атомарно меняет счётчик на delta, не опуская его ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    _change(UserCounters.objects.filter(user_id=user_id), field, delta)
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        _change(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def change_post(post_id, delta):
+    if post_id is not None:
+        _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count(queryset, field):
+    counts = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+@transaction.atomic
+def recount_users(users=None):
+    """Пересчитывает счётчики пользователей по данным таблиц."""
+    users = User.objects.all() if users is None else users
+    UserCounters.objects.bulk_create(
+        [
+            UserCounters(user_id=pk)
+            for pk in users.filter(counters=None).values_list('pk', flat=True)
+        ]
+    )
+    UserCounters.objects.filter(user__in=users).update(
+        posts_count=_count(Post.objects, 'author'),
+        followers_count=_count(Follow.objects, 'author'),
+        following_count=_count(Follow.objects, 'user'),
+    )
+
+
+def for_user(user) -> UserCounters:
+    """Счётчики пользователя; отсутствующая строка создаётся пересчётом."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        recount_users(User.objects.filter(pk=user.pk))
+        return UserCounters.objects.get(user=user)
+
+
+@transaction.atomic
+def recount():
+    """Пересчитывает все счётчики, исправляя расхождения."""
+    recount_users()
+    Group.objects.update(posts_count=_count(Post.objects, 'group'))
+    Post.objects.update(comments_count=_count(Comment.objects, 'post'))
@@ -0,0 +1,223 @@
+"""Генератор синтетических данных для нагрузочных проверок.
+
+Авторы постов и популярность пользователей распределены по степенному
+закону: пользователь ранга r пишет и собирает подписчиков с весом
+1 / r ** alpha. Тексты берутся из заранее сгенерированных Faker пулов,
+а все случайные выборы делает один генератор с заданным seed, поэтому
+одинаковые параметры дают одинаковые данные.
+"""
+import random
+from array import array
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from core.cache import bump_generation
+from core.utils import batches
+
+from . import counters, feeds, follows, search
+from .models import Comment, Follow, Group, Post, User
+from .transfer import bulk_insert
+
+TEXT_POOL_SIZE = 2000
+NAME_POOL_SIZE = 500
+PASSWORD = 'password'
+
+
+def power_law(size, alpha):
+    """Накопленные веса рангов 1..size для random.choices."""
+    return list(accumulate(1 / rank ** alpha for rank in range(1, size + 1)))
+
+
+class DatasetGenerator:
+    """Создаёт пользователей, группы, посты, комментарии и подписки.
+
+    Объекты сохраняются через bulk_insert пачками по batch_size, номера
+    созданных строк хранятся в компактных массивах. После каждой пачки
+    вызывается progress(имя таблицы, число созданных строк).
+    """
+
+    def __init__(
+        self,
+        seed=0,
+        alpha=1.1,
+        days=365,
+        prefix='load',
+        batch_size=5000,
+        locale='ru_RU',
+        progress=None,
+    ):
+        self.random = random.Random(seed)
+        self.faker = Faker(locale)
+        self.faker.seed_instance(seed)
+        self.alpha = alpha
+        self.days = days
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.progress = progress or (lambda table, created: None)
+        self.now = timezone.now()
+        self._weights = {}
+
+        self.post_texts = [
+            self.faker.paragraph(nb_sentences=5)
+            for _ in range(TEXT_POOL_SIZE)
+        ]
+        self.comment_texts = [
+            self.faker.sentence() for _ in range(TEXT_POOL_SIZE)
+        ]
+        self.first_names = [
+            self.faker.first_name() for _ in range(NAME_POOL_SIZE)
+        ]
+        self.last_names = [
+            self.faker.last_name() for _ in range(NAME_POOL_SIZE)
+        ]
+
+    def _save(self, model, table, objects, **options):
+        """Сохраняет объекты пачками и возвращает номера новых строк."""
+        last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        created = 0
+        for batch in batches(objects, self.batch_size):
+            with transaction.atomic():
+                bulk_insert(model, batch, **options)
+            created += len(batch)
+            self.progress(table, created)
+        return array(
+            'q',
+            model.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+            .iterator(chunk_size=self.batch_size),
+        )
+
+    def _pub_date(self):
+        return self.now - timedelta(seconds=self.random.random() * (
+            self.days * 24 * 60 * 60
+        ))
+
+    def _popular(self, ids, k):
+        """k номеров из ids, первые номера выбираются чаще."""
+        weights = self._weights.get(len(ids))
+        if weights is None:
+            weights = self._weights[len(ids)] = power_law(len(ids), self.alpha)
+        return self.random.choices(ids, cum_weights=weights, k=k)
+
+    def users(self, count):
+        password = make_password(PASSWORD)
+        return self._save(User, 'users', (
+            User(
+                username=f'{self.prefix}_{i}',
+                first_name=self.random.choice(self.first_names),
+                last_name=self.random.choice(self.last_names),
+                password=password,
+            )
+            for i in range(count)
+        ))
+
+    def groups(self, count):
+        return self._save(Group, 'groups', (
+            Group(
+                title=self.faker.sentence(nb_words=3).rstrip('.'),
+                slug=f'{self.prefix}-{i}',
+                description=self.random.choice(self.comment_texts),
+            )
+            for i in range(count)
+        ))
+
+    def posts(self, count, authors, groups, group_ratio=0.5):
+        def generate():
+            for _ in range(count):
+                group = None
+                if groups and self.random.random() < group_ratio:
+                    group = self._popular(groups, 1)[0]
+                yield Post(
+                    author_id=self._popular(authors, 1)[0],
+                    group_id=group,
+                    text=self.random.choice(self.post_texts),
+                    pub_date=self._pub_date(),
+                )
+
+        return self._save(Post, 'posts', generate())
+
+    def comments(self, count, posts, authors):
+        def generate():
+            for _ in range(count):
+                yield Comment(
+                    post_id=self._popular(posts, 1)[0],
+                    author_id=self.random.choice(authors),
+                    text=self.random.choice(self.comment_texts),
+                    pub_date=self._pub_date(),
+                )
+
+        return self._save(Comment, 'comments', generate())
+
+    def follows(self, users, authors, average):
+        """Подписки: число подписок пользователя распределено
+        экспоненциально, авторы выбираются по популярности.
+        """
+        def generate():
+            for user in users:
+                count = min(
+                    len(authors) - 1,
+                    int(self.random.expovariate(1 / average)),
+                )
+                for author in set(self._popular(authors, count)) - {user}:
+                    yield Follow(
+                        user_id=user,
+                        author_id=author,
+                        pub_date=self._pub_date(),
+                    )
+
+        return self._save(Follow, 'follows', generate())
+
+    def generate(
+        self,
+        users,
+        groups=0,
+        posts=0,
+        comments=0,
+        follows=0,
+        group_ratio=0.5,
+    ):
+        """Создаёт все таблицы и возвращает число строк в каждой."""
+        users_prefix = f'{self.prefix}_'
+        if User.objects.filter(username__startswith=users_prefix).exists():
+            raise ValueError(
+                f'Пользователи с префиксом {self.prefix} уже существуют'
+            )
+        user_ids = self.users(users)
+        group_ids = self.groups(groups)
+
+        # Ранги по популярности – случайная перестановка пользователей.
+        authors = array('q', user_ids)
+        self.random.shuffle(authors)
+
+        post_ids = self.posts(posts, authors, group_ids, group_ratio)
+        counts = {
+            'users': len(user_ids),
+            'groups': len(group_ids),
+            'posts': len(post_ids),
+            'comments': 0,
+            'follows': 0,
+        }
+        if post_ids and comments:
+            # Новые посты популярнее: веса идут от последнего номера.
+            recent = array('q', reversed(post_ids))
+            counts['comments'] = len(self.comments(comments, recent, user_ids))
+        if follows and len(user_ids) > 1:
+            counts['follows'] = len(self.follows(user_ids, authors, follows))
+        return counts
+
+    def refresh(self):
+        """Пересчитывает то, что при обычном сохранении ведут сигналы."""
+        counters.recount()
+        feeds.rebuild(
+            User.objects.filter(username__startswith=f'{self.prefix}_')
+        )
+        search.rebuild()
+        bump_generation('posts', 'groups')
+        follows.reset()
@@ -0,0 +1,201 @@
+from django.conf import settings
+from django.db import connection, transaction
+
+from core.cache import shared_cache
+from core.pagination import CursorPaginator, MergedCursorPaginator
+from core.utils import batches
+
+from . import follows
+from .models import FeedEntry, Follow, Post, UserCounters
+
+FEED_BATCH_SIZE = 1000
+CELEBRITIES_CACHE_KEY = 'feeds:celebrities'
+
+
+def _bulk_insert(entries):
+    # Размер запросов внутри пачки bulk_create подбирает сам под лимиты базы.
+    for batch in batches(entries, FEED_BATCH_SIZE):
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _status(author_id):
+    """Число подписчиков автора и его статус популярного."""
+    return (
+        UserCounters.objects.filter(user_id=author_id)
+        .values_list('followers_count', 'celebrity')
+        .first()
+        or (0, False)
+    )
+
+
+def _set_celebrity(author_id, celebrity) -> bool:
+    """Меняет статус автора, True – если статус изменился этим вызовом."""
+    changed = (
+        UserCounters.objects.filter(user_id=author_id)
+        .exclude(celebrity=celebrity)
+        .update(celebrity=celebrity)
+    )
+    if changed:
+        shared_cache().delete(CELEBRITIES_CACHE_KEY)
+    return bool(changed)
+
+
+def celebrities() -> frozenset:
+    """Популярные авторы, см. FEED_CELEBRITY_THRESHOLD.
+
+    Их посты не раскладываются по лентам при записи, а подмешиваются
+    в ленту при чтении.
+    """
+    cache = shared_cache()
+    authors = cache.get(CELEBRITIES_CACHE_KEY)
+    if authors is None:
+        authors = frozenset(
+            UserCounters.objects.filter(celebrity=True).values_list(
+                'user_id', flat=True
+            )
+        )
+        cache.set(CELEBRITIES_CACHE_KEY, authors, None)
+    return authors
+
+
+def fan_out_post(post):
+    """Добавляет пост в ленты всех подписчиков автора."""
+    if post.author_id in celebrities():
+        return
+    followers = (
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def add_author(user_id, author_id):
+    """Добавляет в ленту пользователя все посты автора."""
+    if author_id in celebrities():
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def remove_author(user_id, author_id):
+    """Удаляет посты автора из ленты, если подписки на него больше нет."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        return
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def follow_added(user_id, author_id):
+    count, celebrity = _status(author_id)
+    if not celebrity and count >= settings.FEED_CELEBRITY_THRESHOLD:
+        _set_celebrity(author_id, True)
+    add_author(user_id, author_id)
+
+
+def follow_removed(user_id, author_id):
+    remove_author(user_id, author_id)
+    count, celebrity = _status(author_id)
+    if (
+        celebrity
+        and count < settings.FEED_CELEBRITY_DEMOTE_THRESHOLD
+        and _set_celebrity(author_id, False)
+    ):
+        # Посты автора раскладываются по лентам всех подписчиков сразу.
+        _insert_entries(
+            ['follow.author_id = %s'], [author_id], ignore_conflicts=True
+        )
+
+
+def paginator(user, per_page) -> CursorPaginator:
+    """Пагинатор ленты подписок.
+
+    Посты обычных авторов читаются из материализованной ленты, посты
+    популярных авторов – из их собственных лент, и всё сливается по дате.
+    Лента пользователя без подписок пуста и не читается из базы.
+    """
+    if not follows.following(user.pk):
+        return CursorPaginator(Post.objects.none(), per_page)
+    timeline = CursorPaginator(
+        Post.objects.timeline(user),
+        per_page,
+        date_field='timeline_date',
+        pk_field='timeline_post',
+    )
+    authors = sorted(follows.followed_authors(user.pk, celebrities()))
+    if not authors:
+        return timeline
+
+    return MergedCursorPaginator(
+        [timeline]
+        + [
+            CursorPaginator(
+                Post.objects.feed().filter(author_id=author_id), per_page
+            )
+            for author_id in authors
+        ],
+        per_page,
+    )
+
+
+def _insert_entries(conditions, params, ignore_conflicts=False):
+    """Заполняет ленты одним запросом INSERT ... SELECT по таблицам
+    подписок и постов.
+    """
+    ops = connection.ops
+    where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=ignore_conflicts)} '
+            f'{FeedEntry._meta.db_table} (user_id, post_id, pub_date) '
+            f'SELECT DISTINCT follow.user_id, post.id, post.pub_date '
+            f'FROM {Follow._meta.db_table} follow '
+            f'JOIN {Post._meta.db_table} post '
+            f'ON post.author_id = follow.author_id {where} '
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts)}',
+            params,
+        )
+
+
+@transaction.atomic
+def rebuild(users=None):
+    """Пересобирает ленты пользователей по текущим подпискам.
+
+    Статусы популярных авторов приводятся в соответствие с числом
+    подписчиков. Возвращает число созданных записей.
+    """
+    counters = UserCounters.objects.all()
+    counters.filter(
+        celebrity=False,
+        followers_count__gte=settings.FEED_CELEBRITY_THRESHOLD,
+    ).update(celebrity=True)
+    counters.filter(
+        celebrity=True,
+        followers_count__lt=settings.FEED_CELEBRITY_DEMOTE_THRESHOLD,
+    ).update(celebrity=False)
+    shared_cache().delete(CELEBRITIES_CACHE_KEY)
+    entries = FeedEntry.objects.all()
+    conditions, params = [], []
+    if users is not None:
+        entries = entries.filter(user__in=users)
+        users_sql, users_params = users.values('pk').query.sql_with_params()
+        conditions.append(f'follow.user_id IN ({users_sql})')
+        params.extend(users_params)
+    excluded = list(celebrities())
+    if excluded:
+        placeholders = ', '.join(['%s'] * len(excluded))
+        conditions.append(f'follow.author_id NOT IN ({placeholders})')
+        params.extend(excluded)
+
+    entries.delete()
+    _insert_entries(conditions, params)
+    return entries.count()
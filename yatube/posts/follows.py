@@ -0,0 +1,99 @@
+"""Граф подписок в общем кэше.
+
+Для каждого пользователя хранятся два множества номеров: авторы, на
+которых он подписан, и его подписчики. Проверка подписки – поиск
+в множестве без запроса к таблице подписок.
+
+Сигналы Follow удаляют множества обоих участников подписки. Загрузки
+в обход моделей сбрасывают весь граф функцией reset(): номер поколения
+GENERATION входит в ключи множеств.
+"""
+from django.db import transaction
+
+from core.cache import bump_generation, get_generation, shared_cache
+
+from .models import Follow
+
+GENERATION = 'follows'
+CACHE_KEY = 'follows:{generation}:{direction}:{user_id}'
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+# Направление: (поле пользователя, поле номеров в множестве).
+DIRECTIONS = {
+    FOLLOWING: ('user_id', 'author_id'),
+    FOLLOWERS: ('author_id', 'user_id'),
+}
+
+
+def _key(generation, direction, user_id):
+    return CACHE_KEY.format(
+        generation=generation, direction=direction, user_id=user_id
+    )
+
+
+def _ids(direction, user_id) -> frozenset:
+    cache = shared_cache()
+    key = _key(get_generation(GENERATION), direction, user_id)
+    ids = cache.get(key)
+    if ids is None:
+        field, other = DIRECTIONS[direction]
+        ids = frozenset(
+            Follow.objects.filter(**{field: user_id}).values_list(
+                other, flat=True
+            )
+        )
+        cache.set(key, ids, None)
+    return ids
+
+
+def following(user_id) -> frozenset:
+    """Номера авторов, на которых подписан пользователь."""
+    return _ids(FOLLOWING, user_id)
+
+
+def followers(user_id) -> frozenset:
+    """Номера подписчиков пользователя."""
+    return _ids(FOLLOWERS, user_id)
+
+
+def is_following(user_id, author_id) -> bool:
+    return author_id in following(user_id)
+
+
+def followed_authors(user_id, author_ids) -> frozenset:
+    """Те из author_ids, на кого подписан пользователь."""
+    return following(user_id).intersection(author_ids)
+
+
+def mutual(user_id) -> list:
+    """Номера пользователей, подписанных друг на друга с пользователем."""
+    return sorted(following(user_id) & followers(user_id))
+
+
+def _forget(entries):
+    generation = get_generation(GENERATION)
+    shared_cache().delete_many(
+        [_key(generation, direction, pk) for direction, pk in entries]
+    )
+
+
+def follow_changed(user_id, author_id):
+    """Удаляет множества участников подписки.
+
+    Как и номера поколений, множества удаляются сразу и ещё раз после
+    фиксации транзакции: иначе параллельный запрос может снова положить
+    в кэш подписки, прочитанные до фиксации.
+    """
+    entries = [(FOLLOWING, user_id), (FOLLOWERS, author_id)]
+    _forget(entries)
+    transaction.on_commit(lambda: _forget(entries))
+
+
+def user_created(user_id):
+    """Удаляет множества, оставшиеся от прежнего владельца номера."""
+    _forget([(FOLLOWING, user_id), (FOLLOWERS, user_id)])
+
+
+def reset():
+    """Сбрасывает весь граф после загрузки подписок в обход сигналов."""
+    bump_generation(GENERATION)
@@ -1,6 +1,11 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
 
 from .models import Comment, Post
+from .uploads import strip_metadata
+from .validators import validate_image
 
 
 class PostForm(forms.ModelForm):
@@ -12,6 +17,31 @@ class PostForm(forms.ModelForm):
         super(PostForm, self).__init__(*args, **kwargs)
         self.fields['group'].empty_label = 'Нет группы'
 
+        # Слишком большой файл не открываем вовсе: ошибку выдаст clean_image.
+        image = self.files.get('image')
+        self.image_too_large = (
+            image is not None and image.size > settings.MAX_UPLOAD_SIZE
+        )
+        if self.image_too_large:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        if self.image_too_large:
+            raise forms.ValidationError(
+                'Размер файла не должен превышать %(size)s.',
+                params={'size': filesizeformat(settings.MAX_UPLOAD_SIZE)},
+            )
+        image = self.cleaned_data['image']
+        if image and hasattr(image, 'image'):
+            # После verify() Pillow закрывает файл, и число кадров GIF
+            # уже не узнать, поэтому заголовок читается заново.
+            image.seek(0)
+            with Image.open(image) as header:
+                validate_image(header)
+            image = strip_metadata(image, image.image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import feeds
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Заполняет материализованные ленты подписок по таблице Follow'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Пользователи, чьи ленты нужно пересобрать. '
+            'По умолчанию пересобираются все ленты',
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+
+        created = feeds.rebuild(users)
+        self.stdout.write(
+            self.style.SUCCESS(f'Создано записей в лентах: {created}')
+        )
@@ -0,0 +1,120 @@
+import random
+import re
+import statistics
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import search
+from posts.benchmarks import percentile
+from posts.analysis import ANALYZERS, get_analyzer
+from posts.models import Post
+
+WORD_RE = re.compile(r'\w{3,}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает анализаторы поиска: размер индекса, время сборки '
+        'и время запросов. Индекс пересобирается в транзакции, которая '
+        'затем откатывается'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'queries',
+            nargs='*',
+            help='Запросы. По умолчанию берутся слова из случайных постов',
+        )
+        parser.add_argument(
+            '--analyzers',
+            nargs='+',
+            default=list(ANALYZERS),
+            help='Анализаторы для сравнения',
+        )
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=50,
+            help='Сколько запросов взять из постов',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Сколько раз выполнять каждый запрос',
+        )
+
+    def sample_queries(self, size):
+        """Пары слов из случайных постов, одинаковые между запусками."""
+        pks = list(Post.objects.values_list('pk', flat=True))
+        pks = random.Random(0).sample(pks, min(size, len(pks)))
+        queries = []
+        for text in Post.objects.filter(pk__in=pks).values_list(
+            'text', flat=True
+        ):
+            words = WORD_RE.findall(text)
+            if words:
+                queries.append(' '.join(words[:2]))
+        return queries
+
+    def index_size(self, analyzer):
+        """Число записей индекса (терм, пост) и размер словаря."""
+        analyze = get_analyzer(analyzer)
+        postings, vocabulary = 0, set()
+        for _, text, comments in search.documents():
+            terms = set(analyze(text))
+            for comment in comments:
+                terms.update(analyze(comment))
+            postings += len(terms)
+            vocabulary |= terms
+        return postings, len(vocabulary)
+
+    def measure(self, analyzer, queries, repeat):
+        with transaction.atomic():
+            started = perf_counter()
+            search.rebuild(analyzer)
+            build = perf_counter() - started
+
+            timings, found = [], 0
+            for query in queries:
+                for _ in range(repeat):
+                    started = perf_counter()
+                    results = search.search(query, analyzer=analyzer)
+                    timings.append(perf_counter() - started)
+                found += len(results)
+            transaction.set_rollback(True)
+        return build, timings, found
+
+    def handle(self, *args, **options):
+        for analyzer in options['analyzers']:
+            try:
+                get_analyzer(analyzer)
+            except ImportError:
+                raise CommandError(f'Неизвестный анализатор: {analyzer}')
+
+        queries = options['queries'] or self.sample_queries(options['sample'])
+        if not queries:
+            raise CommandError('Нет постов, из которых можно взять запросы')
+
+        self.stdout.write(
+            f'Запросов: {len(queries)}, повторов: {options["repeat"]}, '
+            f'индекс: {search.backend().__class__.__name__}'
+        )
+        self.stdout.write(
+            f'{"анализатор":<12}{"записей":>10}{"термов":>10}'
+            f'{"сборка, с":>12}{"медиана, мс":>14}{"p95, мс":>10}'
+            f'{"найдено":>10}'
+        )
+        for analyzer in options['analyzers']:
+            postings, vocabulary = self.index_size(analyzer)
+            build, timings, found = self.measure(
+                analyzer, queries, options['repeat']
+            )
+            median = statistics.median(timings) * 1000
+            p95 = percentile(timings, 95) * 1000
+            self.stdout.write(
+                f'{analyzer:<12}{postings:>10}{vocabulary:>10}'
+                f'{build:>12.2f}{median:>14.2f}{p95:>10.2f}{found:>10}'
+            )
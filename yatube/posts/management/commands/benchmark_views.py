@@ -0,0 +1,124 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from posts import benchmarks
+
+# Кэши процесса, чтобы замеры не трогали общий кэш рабочей базы.
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'core.cache_backends.TwoLevelCache',
+        'OPTIONS': {'SHARED': 'shared'},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет страницы posts на сгенерированных данных в отдельной '
+        'тестовой базе: p50 и p95 времени ответа, число SQL-запросов и '
+        'время отрисовки шаблона. Завершается ошибкой, если превышен '
+        'бюджет из BENCHMARK_BUDGETS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios',
+            nargs='*',
+            help='Имена адресов, например posts:index. По умолчанию все',
+        )
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', help='Файл, в который записать результаты в JSON'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Результаты прошлого запуска в JSON для сравнения',
+        )
+        parser.add_argument(
+            '--no-budgets',
+            action='store_true',
+            help='Только показать замеры, не проверяя бюджеты',
+        )
+
+    def load_baseline(self, path):
+        if not path:
+            return {}
+        try:
+            with open(path, encoding='utf-8') as stream:
+                return json.load(stream)['results']
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+
+    def benchmark(self, names, options):
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                targets = benchmarks.load_dataset(seed=options['seed'])
+                return benchmarks.run(
+                    targets, names, options['iterations'], options['warmup']
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def report(self, results, baseline):
+        self.stdout.write(
+            f'{"адрес":<26}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"шаблон, мс":>12}{"запросов":>10}{"Δ p50":>10}'
+        )
+        for name, result in results.items():
+            delta = ''
+            if name in baseline:
+                delta = f'{result["p50_ms"] - baseline[name]["p50_ms"]:+.2f}'
+            self.stdout.write(
+                f'{name:<26}{result["p50_ms"]:>10.2f}'
+                f'{result["p95_ms"]:>10.2f}{result["render_p50_ms"]:>12.2f}'
+                f'{result["queries"]:>10}{delta:>10}'
+            )
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or list(benchmarks.SCENARIOS)
+        unknown = set(names) - set(benchmarks.SCENARIOS)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные сценарии: {", ".join(sorted(unknown))}'
+            )
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должно быть больше нуля')
+        baseline = self.load_baseline(options['baseline'])
+
+        results = self.benchmark(names, options)
+        self.report(results, baseline)
+        if options['output']:
+            run_options = {
+                key: options[key] for key in ('iterations', 'warmup', 'seed')
+            }
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(
+                    {'options': run_options, 'results': results},
+                    stream,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+
+        if not options['no_budgets']:
+            violations = benchmarks.check_budgets(results)
+            if violations:
+                raise CommandError(
+                    'Превышены бюджеты:\n' + '\n'.join(violations)
+                )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «Кого почитать» по подпискам '
+        'и группам, в которых пишут пользователи'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Пользователи, чьи рекомендации нужно пересчитать. '
+            'По умолчанию пересчитываются все',
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+
+        created = suggestions.build(users)
+        self.stdout.write(
+            self.style.SUCCESS(f'Сохранено рекомендаций: {created}')
+        )
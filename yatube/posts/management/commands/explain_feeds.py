@@ -0,0 +1,145 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+# Без кэша фрагментов страницы выполняют все свои запросы.
+NO_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    for alias in ('default', 'shared')
+}
+EXPLAIN = {
+    'sqlite': 'EXPLAIN QUERY PLAN',
+    'postgresql': 'EXPLAIN',
+}
+# Полный просмотр таблицы и сортировка без индекса в планах SQLite
+# и PostgreSQL. Просмотр подзапроса SQLite (CO-ROUTINE, MATERIALIZE)
+# таблицу не читает.
+FULL_SCAN_RE = re.compile(r'^SCAN (?P<table>\S+)(?!.*\bUSING\b)|Seq Scan')
+SUBQUERY_RE = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (?P<name>\S+)')
+SORT_RE = re.compile(r'USE TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY|Sort')
+# Ссылка «Следующая» из includes/paginator.html.
+NEXT_PAGE_RE = re.compile(r'href="\?cursor=(?P<cursor>[^"]+)">\s*Следующая')
+
+
+class Command(BaseCommand):
+    help = (
+        'Открывает ленты (главная, группа, профиль, пост, подписки) вместе '
+        'со второй страницей по курсору, выполняет EXPLAIN для каждого '
+        'их запроса SELECT и сообщает о полных просмотрах таблиц. Данные '
+        'не меняются: всё выполняется в транзакции, которая откатывается'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Печатать планы всех запросов, а не только проблемных',
+        )
+
+    def pages(self):
+        """Адреса лент и пользователь, от имени которого их открыть.
+
+        Для адресов берутся самые наполненные группа, автор и пост, чтобы
+        планы строились на таблицах с данными.
+        """
+        post = Post.objects.order_by('-comments_count', '-pk').first()
+        viewer = post.author
+        follow = Follow.objects.select_related('user').last()
+        if follow is not None:
+            viewer = follow.user
+        pages = [
+            (reverse('posts:index'), None),
+            (reverse('posts:profile', args=(post.author.username,)), None),
+            (reverse('posts:post_detail', args=(post.pk,)), viewer),
+            (reverse('posts:follow_index'), viewer),
+        ]
+        group = Group.objects.order_by('-posts_count').first()
+        if group is not None:
+            pages.append(
+                (reverse('posts:group_list', args=(group.slug,)), None)
+            )
+        return pages
+
+    def capture(self):
+        """SELECT-запросы лент: {(sql, params): адрес первого запроса}."""
+        queries = {}
+        current = None
+
+        def record(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.setdefault((sql, tuple(params or ())), current)
+            return execute(sql, params, many, context)
+
+        pages = self.pages()
+        with connection.execute_wrapper(record):
+            for url, user in pages:
+                client = Client()
+                if user is not None:
+                    client.force_login(user)
+                for _ in range(2):
+                    current = url
+                    response = client.get(url)
+                    if response.status_code != 200:
+                        raise CommandError(
+                            f'{url}: ответ {response.status_code}'
+                        )
+                    match = NEXT_PAGE_RE.search(response.content.decode())
+                    if match is None:
+                        break
+                    url = f'{url}?cursor={match["cursor"]}'
+        return queries
+
+    def full_scans(self, plan):
+        subqueries = {
+            match['name'] for match in map(SUBQUERY_RE.match, plan) if match
+        }
+        return [
+            line
+            for line, match in zip(plan, map(FULL_SCAN_RE.search, plan))
+            if match and match['table'] not in subqueries
+        ]
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{EXPLAIN[connection.vendor]} {sql}', params)
+            return [str(row[-1]) for row in cursor.fetchall()]
+
+    def handle(self, *args, **options):
+        if connection.vendor not in EXPLAIN:
+            raise CommandError(
+                f'EXPLAIN для {connection.vendor} не поддерживается'
+            )
+        if not Post.objects.exists():
+            raise CommandError('Нет постов: сначала выполните generate_data')
+
+        with override_settings(CACHES=NO_CACHES), transaction.atomic():
+            queries = self.capture()
+            plans = {query: self.explain(*query) for query in queries}
+            transaction.set_rollback(True)
+
+        full_scans = 0
+        for (sql, params), plan in plans.items():
+            scans = self.full_scans(plan)
+            sorts = [line for line in plan if SORT_RE.search(line)]
+            full_scans += bool(scans)
+            if not (scans or sorts or options['verbose_plans']):
+                continue
+            label = self.style.ERROR('ПОЛНЫЙ ПРОСМОТР') if scans else (
+                self.style.WARNING('СОРТИРОВКА') if sorts else 'ПЛАН'
+            )
+            self.stdout.write(f'{label} {queries[(sql, params)]}')
+            self.stdout.write(f'  {sql}')
+            for line in plan:
+                self.stdout.write(f'    {line}')
+
+        self.stdout.write(
+            f'Запросов: {len(plans)}, с полным просмотром: {full_scans}'
+        )
+        if full_scans:
+            raise CommandError('Есть запросы с полным просмотром таблиц')
@@ -0,0 +1,49 @@
+import sys
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает таблицу в NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=list(transfer.TABLES))
+        parser.add_argument(
+            'path', nargs='?', default='-', help='Файл, по умолчанию stdout'
+        )
+        parser.add_argument(
+            '--format',
+            choices=transfer.FORMATS,
+            help='Формат, по умолчанию по расширению файла',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=transfer.DEFAULT_BATCH_SIZE,
+            help='Сколько строк читать из базы за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        table = transfer.TABLES[options['table']]
+        path = options['path']
+        data_format = options['format'] or transfer.guess_format(path)
+        rows = transfer.export_rows(table, options['batch_size'])
+
+        started = perf_counter()
+        if path == '-':
+            written = transfer.write_rows(
+                sys.stdout, data_format, table.columns, rows
+            )
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as stream:
+                written = transfer.write_rows(
+                    stream, data_format, table.columns, rows
+                )
+        elapsed = perf_counter() - started
+        self.stderr.write(
+            f'Выгружено строк: {written} за {elapsed:.1f} с '
+            f'({written / max(elapsed, 1e-6):.0f} строк/с)'
+        )
@@ -0,0 +1,93 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.dataset import PASSWORD, DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетических пользователей, группы, посты, комментарии '
+        'и подписки для нагрузочных проверок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows',
+            type=float,
+            default=20,
+            help='Среднее число подписок пользователя',
+        )
+        parser.add_argument(
+            '--group-ratio',
+            type=float,
+            default=0.5,
+            help='Доля постов, опубликованных в группах',
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.1,
+            help='Показатель степенного распределения популярности',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько последних дней распределить даты публикации',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix',
+            default='load',
+            help='Префикс имён пользователей и адресов групп',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-rebuild',
+            action='store_true',
+            help='Не пересчитывать счётчики, ленты и поисковый индекс',
+        )
+
+    def progress(self, table, created):
+        elapsed = perf_counter() - self.started
+        self.stderr.write(
+            f'{table}: {created} ({created / max(elapsed, 1e-6):.0f} строк/с)'
+        )
+
+    def handle(self, *args, **options):
+        generator = DatasetGenerator(
+            seed=options['seed'],
+            alpha=options['alpha'],
+            days=options['days'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            progress=self.progress,
+        )
+        self.started = perf_counter()
+        try:
+            created = generator.generate(
+                users=options['users'],
+                groups=options['groups'],
+                posts=options['posts'],
+                comments=options['comments'],
+                follows=options['follows'],
+                group_ratio=options['group_ratio'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        if not options['no_rebuild']:
+            generator.refresh()
+
+        summary = ', '.join(f'{table}: {count}' for table, count in (
+            created.items()
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {summary} за {perf_counter() - self.started:.1f} с. '
+            f'Пароль пользователей: {PASSWORD}'
+        ))
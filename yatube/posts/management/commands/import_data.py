@@ -0,0 +1,69 @@
+import sys
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает таблицу из NDJSON или CSV пачками и пересчитывает '
+        'счётчики, ленты подписок и поисковый индекс'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=list(transfer.TABLES))
+        parser.add_argument(
+            'path', nargs='?', default='-', help='Файл, по умолчанию stdin'
+        )
+        parser.add_argument(
+            '--format',
+            choices=transfer.FORMATS,
+            help='Формат, по умолчанию по расширению файла',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=transfer.DEFAULT_BATCH_SIZE,
+            help='Сколько строк сохранять одним запросом',
+        )
+        parser.add_argument(
+            '--no-rebuild',
+            action='store_true',
+            help='Не пересчитывать производные данные после загрузки, '
+            'например если будут загружаться ещё таблицы',
+        )
+
+    def load(self, importer, stream, data_format):
+        started = perf_counter()
+        for read in importer.load(transfer.read_rows(stream, data_format)):
+            elapsed = perf_counter() - started
+            self.stderr.write(
+                f'Прочитано строк: {read} '
+                f'({read / max(elapsed, 1e-6):.0f} строк/с)'
+            )
+
+    def handle(self, *args, **options):
+        table = transfer.TABLES[options['table']]
+        path = options['path']
+        data_format = options['format'] or transfer.guess_format(path)
+        importer = transfer.Importer(
+            table, options['batch_size'], on_error=self.stderr.write
+        )
+
+        if path == '-':
+            self.load(importer, sys.stdin, data_format)
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                self.load(importer, stream, data_format)
+
+        if not options['no_rebuild']:
+            transfer.rebuild_derived(table)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Прочитано строк: {importer.read}, '
+                f'добавлено: {importer.inserted}, '
+                f'пропущено: {importer.skipped}'
+            )
+        )
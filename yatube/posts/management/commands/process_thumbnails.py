@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Готовит миниатюры картинок постов из очереди заданий'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=2, help='Число потоков'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Не завершаться, а ждать новых заданий',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Пауза между опросами пустой очереди, секунды',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            done = thumbnails.process_pending(workers=options['workers'])
+            if done:
+                self.stdout.write(f'Готово миниатюр: {done}')
+            if not options['loop']:
+                break
+            if not done:
+                time.sleep(options['interval'])
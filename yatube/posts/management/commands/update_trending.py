@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг популярных постов и групп по новым '
+        'комментариям и подпискам. Запускается по расписанию'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать рейтинг заново, не используя прошлые веса',
+        )
+
+    def handle(self, *args, **options):
+        ranked = trending.update(full=options['full'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Популярных постов: {ranked}')
+        )
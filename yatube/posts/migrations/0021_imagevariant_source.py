@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 22:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_sources(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ImageVariant = apps.get_model('posts', 'ImageVariant')
+    ImageVariant.objects.update(
+        source=Subquery(
+            Post.objects.filter(pk=OuterRef('post_id')).values('image')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_auto_20261018_2110'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagevariant',
+            name='source',
+            field=models.CharField(default='', max_length=100, verbose_name='Исходная картинка'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_sources, migrations.RunPython.noop),
+    ]
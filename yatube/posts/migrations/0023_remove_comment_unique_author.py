@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+CONSTRAINT_NAME = 'Уникальность подписки'
+
+
+def drop_unique_author(apps, schema_editor):
+    """Убирает ограничение, попавшее в базы из прежней версии 0013."""
+    Comment = apps.get_model('posts', 'Comment')
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, Comment._meta.db_table
+        )
+    if CONSTRAINT_NAME in constraints:
+        schema_editor.remove_constraint(
+            Comment,
+            models.UniqueConstraint(
+                fields=['post', 'author'], name=CONSTRAINT_NAME
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_thumbnailjob_claimed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(blank=True, help_text='Комментарии к посту', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='posts.Post', verbose_name='Пост'),
+        ),
+        migrations.RunPython(drop_unique_author, migrations.RunPython.noop),
+    ]
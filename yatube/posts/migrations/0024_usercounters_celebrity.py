@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_celebrities(apps, schema_editor):
+    """Популярными остаются те, кто был ими по прежнему правилу."""
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    UserCounters.objects.filter(
+        followers_count__gte=settings.FEED_CELEBRITY_THRESHOLD
+    ).update(celebrity=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_remove_comment_unique_author'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercounters',
+            name='celebrity',
+            field=models.BooleanField(default=False, help_text='Посты автора не раскладываются по лентам подписчиков', verbose_name='Популярный автор'),
+        ),
+        migrations.AddIndex(
+            model_name='usercounters',
+            index=models.Index(condition=models.Q(celebrity=True), fields=['celebrity'], name='usercounters_celebrity_idx'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,7 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.urls import reverse
 
-from core.models import CreatedModel
+from core.models import AtomicSaveModel, CreatedModel
 
 from .validators import validate_not_empty
 
@@ -22,12 +22,54 @@ class Group(models.Model):
         help_text='Уникальное значение. Максимальная длина – 200 символов',
     )
     description = models.TextField(verbose_name='Описание группы')
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Количество постов', default=0, editable=False
+    )
 
     def __str__(self):
         return self.title
 
 
-class Post(CreatedModel):
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Посты для лент: автор и группа одним запросом.
+
+        Загружаются только поля, которые используют шаблоны лент, варианты
+        картинок подгружаются одним запросом на страницу.
+        """
+        return (
+            self.select_related('author', 'group')
+            .prefetch_related('image_variants')
+            .only(
+                'text',
+                'pub_date',
+                'image',
+                'comments_count',
+                'author__username',
+                'author__first_name',
+                'author__last_name',
+                'group__slug',
+                'group__title',
+            )
+        )
+
+    def timeline(self, user):
+        """Лента подписок пользователя из материализованных записей.
+
+        Поля timeline_date и timeline_post совпадают с pub_date и pk поста,
+        но сортировка по ним идёт по индексу таблицы FeedEntry.
+        """
+        return (
+            self.feed()
+            .filter(feed_entries__user=user)
+            .annotate(
+                timeline_date=models.F('feed_entries__pub_date'),
+                timeline_post=models.F('feed_entries__post'),
+            )
+        )
+
+
+class Post(AtomicSaveModel, CreatedModel):
     text = models.TextField(
         verbose_name='Текст поста',
         validators=[validate_not_empty],
@@ -49,11 +91,26 @@ class Post(CreatedModel):
         help_text='Группа, к которой будет относиться пост',
     )
     image = models.ImageField('Картинка', upload_to='posts/', blank=True)
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Количество комментариев', default=0, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -64,7 +121,7 @@ class Post(CreatedModel):
         )
 
 
-class Comment(CreatedModel):
+class Comment(AtomicSaveModel, CreatedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -90,14 +147,15 @@ class Comment(CreatedModel):
         ordering = ('-pub_date',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
-        constraints = [
-            models.UniqueConstraint(
-                fields=['post', 'author'], name='Уникальность подписки'
+        indexes = [
+            models.Index(
+                fields=['post', '-pub_date', '-id'],
+                name='comment_post_date_idx',
             )
         ]
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveModel, CreatedModel):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -110,3 +168,249 @@ class Follow(models.Model):
         related_name='follower',
         verbose_name='Подписчик',
     )
+
+    class Meta:
+        verbose_name = 'Подписка'
+        verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            )
+        ]
+
+
+class UserCounters(models.Model):
+    """Счётчики пользователя, которые поддерживаются сигналами."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Количество постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0, db_index=True
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок', default=0
+    )
+    celebrity = models.BooleanField(
+        'Популярный автор',
+        default=False,
+        help_text='Посты автора не раскладываются по лентам подписчиков',
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+        indexes = [
+            # Популярных авторов единицы, индекс хранит только их.
+            models.Index(
+                fields=['celebrity'],
+                name='usercounters_celebrity_idx',
+                condition=models.Q(celebrity=True),
+            )
+        ]
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_entry_timeline_idx',
+            )
+        ]
+
+
+class Suggestion(models.Model):
+    """Рекомендация автора, на которого стоит подписаться."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name='Пользователь',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggested_to',
+        verbose_name='Автор',
+    )
+    score = models.PositiveIntegerField('Вес')
+
+    class Meta:
+        ordering = ('-score', 'author')
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_suggestion'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score', 'author'],
+                name='suggestion_user_score_idx',
+            )
+        ]
+
+
+class PostTrend(models.Model):
+    """Вес поста в ленте популярного с учётом давности активности."""
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trend',
+        verbose_name='Пост',
+    )
+    score = models.FloatField('Вес', db_index=True)
+    updated = models.DateTimeField('Пересчитан')
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name = 'Популярный пост'
+        verbose_name_plural = 'Популярные посты'
+
+
+class GroupTrend(models.Model):
+    """Вес группы: сумма весов её популярных постов."""
+
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trend',
+        verbose_name='Группа',
+    )
+    score = models.FloatField('Вес', db_index=True)
+    updated = models.DateTimeField('Пересчитан')
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name = 'Популярная группа'
+        verbose_name_plural = 'Популярные группы'
+
+
+class ThumbnailJob(CreatedModel):
+    """Задание очереди на подготовку миниатюры картинки поста."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='thumbnail_jobs',
+        verbose_name='Пост',
+    )
+    geometry = models.CharField('Размер', max_length=50)
+    status = models.CharField(
+        'Статус', max_length=10, choices=STATUSES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    error = models.TextField('Ошибка', blank=True)
+    claimed = models.DateTimeField('Взято в работу', null=True, blank=True)
+
+    class Meta:
+        ordering = ('pub_date',)
+        verbose_name = 'Задание на миниатюру'
+        verbose_name_plural = 'Задания на миниатюры'
+        indexes = [
+            models.Index(
+                fields=['status', 'pub_date'], name='thumbnail_job_queue_idx'
+            )
+        ]
+
+
+class ImageVariant(models.Model):
+    """Уменьшенная копия картинки поста заданной ширины и формата."""
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_variants',
+        verbose_name='Пост',
+    )
+    geometry = models.CharField('Размер', max_length=50)
+    width = models.PositiveSmallIntegerField('Ширина')
+    height = models.PositiveSmallIntegerField('Высота')
+    format = models.CharField('Формат', max_length=10)
+    image = models.ImageField('Картинка', upload_to='posts/variants/')
+    # Имя файла картинки поста, из которой сделан вариант.
+    source = models.CharField('Исходная картинка', max_length=100)
+
+    class Meta:
+        ordering = ('width',)
+        verbose_name = 'Вариант картинки'
+        verbose_name_plural = 'Варианты картинок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'geometry', 'width', 'format'],
+                name='unique_image_variant',
+            )
+        ]
+
+
+class SearchPosting(models.Model):
+    """Запись инвертированного индекса: терм и вес его вхождений в пост."""
+
+    term = models.CharField('Терм', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_postings',
+        verbose_name='Пост',
+    )
+    weight = models.PositiveIntegerField('Вес')
+
+    class Meta:
+        verbose_name = 'Запись поискового индекса'
+        verbose_name_plural = 'Записи поискового индекса'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'], name='unique_search_posting'
+            )
+        ]
@@ -0,0 +1,313 @@
+"""Полнотекстовый поиск по постам и комментариям к ним.
+
+Документ индекса – пост: его текст и тексты всех комментариев к нему.
+На SQLite с FTS5 индекс хранится в виртуальной таблице posts_search,
+на остальных базах – в таблице SearchPosting. В оба индекса пишутся термы
+после анализатора, поэтому запрос разбирается одинаково.
+"""
+import math
+from collections import Counter, defaultdict
+from collections.abc import Sequence
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import (
+    Case,
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    IntegerField,
+    Sum,
+    When,
+)
+from django.db.models.expressions import RawSQL
+
+from .analysis import get_analyzer
+from .models import Comment, Post, SearchPosting
+
+FTS_TABLE = 'posts_search'
+TEXT_WEIGHT = 2
+COMMENTS_WEIGHT = 1
+INDEX_BATCH_SIZE = 500
+
+
+def parse_query(query: str, analyzer=None) -> list:
+    """Термы запроса без повторов в порядке появления."""
+    return list(dict.fromkeys(get_analyzer(analyzer)(query)))
+
+
+class Fts5Index:
+    """Индекс в виртуальной таблице FTS5, ранжирование по BM25."""
+
+    def _match(self, terms):
+        return ' '.join(f'"{term}"' for term in terms)
+
+    def index(self, post_id, text, comments):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, comments) '
+                f'VALUES (%s, %s, %s)',
+                [post_id, ' '.join(text), ' '.join(comments)],
+            )
+
+    def add_comment(self, post_id, comment):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {FTS_TABLE} SET comments = comments || ' ' || %s "
+                f'WHERE rowid = %s',
+                [' '.join(comment), post_id],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def ranked(self, terms, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, %s, %s), rowid DESC '
+                f'LIMIT %s',
+                [self._match(terms), TEXT_WEIGHT, COMMENTS_WEIGHT, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter(self, queryset, terms):
+        return queryset.filter(
+            pk__in=RawSQL(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [self._match(terms)],
+            )
+        )
+
+
+class PostingsIndex:
+    """Индекс в обычной таблице (терм, пост, вес), ранжирование по TF-IDF.
+
+    Вес терма – число вхождений в текст поста с множителем TEXT_WEIGHT
+    плюс число вхождений в комментарии с множителем COMMENTS_WEIGHT.
+    """
+
+    def index(self, post_id, text, comments):
+        weights = Counter()
+        for term in text:
+            weights[term] += TEXT_WEIGHT
+        for term in comments:
+            weights[term] += COMMENTS_WEIGHT
+        SearchPosting.objects.filter(post_id=post_id).delete()
+        SearchPosting.objects.bulk_create(
+            SearchPosting(term=term, post_id=post_id, weight=weight)
+            for term, weight in weights.items()
+        )
+
+    def add_comment(self, post_id, comment):
+        weights = Counter()
+        for term in comment:
+            weights[term] += COMMENTS_WEIGHT
+        postings = SearchPosting.objects.filter(post_id=post_id)
+        existing = set(
+            postings.filter(term__in=weights).values_list('term', flat=True)
+        )
+        if existing:
+            added = Case(
+                *(When(term=term, then=weights[term]) for term in existing),
+                output_field=IntegerField(),
+            )
+            postings.filter(term__in=existing).update(
+                weight=F('weight') + added
+            )
+        SearchPosting.objects.bulk_create(
+            SearchPosting(term=term, post_id=post_id, weight=weight)
+            for term, weight in weights.items()
+            if term not in existing
+        )
+
+    def remove(self, post_id):
+        SearchPosting.objects.filter(post_id=post_id).delete()
+
+    def clear(self):
+        SearchPosting.objects.all().delete()
+
+    def _matches(self, terms):
+        return (
+            SearchPosting.objects.filter(term__in=terms)
+            .order_by()
+            .values('post')
+            .annotate(matched=Count('term'))
+            .filter(matched=len(terms))
+        )
+
+    def ranked(self, terms, limit):
+        frequencies = dict(
+            SearchPosting.objects.filter(term__in=terms)
+            .order_by()
+            .values_list('term')
+            .annotate(Count('post'))
+        )
+        if len(frequencies) < len(terms):
+            return []
+
+        total = Post.objects.count()
+        score = Sum(
+            Case(
+                *(
+                    When(
+                        term=term,
+                        then=ExpressionWrapper(
+                            F('weight') * math.log(1 + total / frequency),
+                            output_field=FloatField(),
+                        ),
+                    )
+                    for term, frequency in frequencies.items()
+                ),
+                output_field=FloatField(),
+            )
+        )
+        return list(
+            self._matches(terms)
+            .annotate(score=score)
+            .order_by('-score', '-post')
+            .values_list('post', flat=True)[:limit]
+        )
+
+    def filter(self, queryset, terms):
+        return queryset.filter(pk__in=self._matches(terms).values('post'))
+
+
+BACKENDS = {
+    'fts5': Fts5Index,
+    'postings': PostingsIndex,
+}
+
+
+@lru_cache(maxsize=None)
+def _fts5_ready(vendor):
+    return vendor == 'sqlite' and (
+        FTS_TABLE in connection.introspection.table_names()
+    )
+
+
+def backend():
+    """Индекс, выбранный настройкой SEARCH_BACKEND."""
+    name = settings.SEARCH_BACKEND
+    if name == 'auto':
+        name = 'fts5' if _fts5_ready(connection.vendor) else 'postings'
+    return BACKENDS[name]()
+
+
+def index_post(post):
+    """Переиндексирует пост вместе с комментариями к нему."""
+    analyze = get_analyzer()
+    comments = Comment.objects.filter(post_id=post.pk).values_list(
+        'text', flat=True
+    )
+    backend().index(
+        post.pk,
+        analyze(post.text),
+        [term for comment in comments for term in analyze(comment)],
+    )
+
+
+def add_comment(comment):
+    """Дописывает в индекс поста термы нового комментария.
+
+    Остальные комментарии к посту не перечитываются, поэтому число запросов
+    не зависит от их количества.
+    """
+    terms = get_analyzer()(comment.text)
+    if terms:
+        backend().add_comment(comment.post_id, terms)
+
+
+def remove_post(post_id):
+    """Удаляет пост из индекса."""
+    backend().remove(post_id)
+
+
+def filter_posts(queryset, query: str):
+    """Оставляет в queryset посты, содержащие все термы запроса."""
+    terms = parse_query(query)
+    if not terms:
+        return queryset.none()
+    return backend().filter(queryset, terms)
+
+
+class SearchResults(Sequence):
+    """Ранжированные результаты поиска.
+
+    Номера найденных постов получаются одним запросом к индексу, а сами
+    посты загружаются только для запрошенного среза, то есть для страницы.
+    """
+
+    def __init__(self, post_ids, queryset):
+        self.post_ids = post_ids
+        self.queryset = queryset
+
+    def __len__(self):
+        return len(self.post_ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        post_ids = self.post_ids[index]
+        posts = self.queryset.in_bulk(post_ids)
+        return [posts[pk] for pk in post_ids if pk in posts]
+
+
+def search(query: str, queryset=None, analyzer=None) -> SearchResults:
+    """Ищет посты по тексту и комментариям, лучшие совпадения – первыми."""
+    terms = parse_query(query, analyzer)
+    post_ids = (
+        backend().ranked(terms, settings.SEARCH_MAX_RESULTS) if terms else []
+    )
+    if queryset is None:
+        queryset = Post.objects.feed()
+    return SearchResults(post_ids, queryset)
+
+
+def documents():
+    """Тексты постов и списки текстов комментариев к ним пачками."""
+    posts = Post.objects.order_by('pk').values_list('pk', 'text')
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:INDEX_BATCH_SIZE])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+
+        comments = defaultdict(list)
+        for post_id, text in Comment.objects.filter(
+            post_id__in=[post_id for post_id, _ in batch]
+        ).values_list('post_id', 'text'):
+            comments[post_id].append(text)
+        for post_id, text in batch:
+            yield post_id, text, comments[post_id]
+
+
+def rebuild(analyzer=None) -> int:
+    """Пересобирает индекс по всем постам, возвращает их число."""
+    index = backend()
+    analyze = get_analyzer(analyzer)
+    indexed = 0
+    with transaction.atomic():
+        index.clear()
+        for post_id, text, comments in documents():
+            index.index(
+                post_id,
+                analyze(text),
+                [term for comment in comments for term in analyze(comment)],
+            )
+            indexed += 1
+    return indexed
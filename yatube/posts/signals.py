@@ -0,0 +1,134 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache import bump_generation
+from core.metrics import Counter
+
+from . import counters, feeds, follows, search, suggestions, thumbnails
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+CREATED = Counter(
+    'yatube_objects_created_total',
+    'Регистрации, новые посты и комментарии',
+    ('model',),
+)
+
+
+def _bump_post(post, *group_ids):
+    """Сбрасывает кэш лент, в которых показывается пост."""
+    group_ids = {post.group_id, *group_ids} - {None}
+    bump_generation(
+        'posts',
+        f'author:{post.author_id}',
+        *(f'group:{group_id}' for group_id in group_ids),
+    )
+
+
+def _bump_author(author_id):
+    """Сбрасывает кэш лент, в которых показываются посты автора."""
+    group_ids = (
+        Post.objects.filter(author_id=author_id, group__isnull=False)
+        .values_list('group_id', flat=True)
+        .distinct()
+    )
+    bump_generation(
+        'posts',
+        f'author:{author_id}',
+        *(f'group:{group_id}' for group_id in group_ids),
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+        follows.user_created(instance.pk)
+        CREATED.inc(model='user')
+    elif update_fields != {'last_login'}:
+        # Имя автора выводится в карточках постов, а вход на сайт
+        # меняет только время последнего входа.
+        _bump_author(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    saved = (
+        Post.objects.filter(pk=instance.pk)
+        .values_list('group_id', 'image')
+        .first()
+        if instance.pk
+        else None
+    )
+    instance._saved_group_id, instance._saved_image = saved or (None, '')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    _bump_post(instance, instance._saved_group_id)
+    search.index_post(instance)
+    if instance.image.name != instance._saved_image:
+        thumbnails.enqueue(instance)
+    if created:
+        CREATED.inc(model='post')
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        counters.change_group(instance.group_id, 1)
+        feeds.fan_out_post(instance)
+    elif instance._saved_group_id != instance.group_id:
+        counters.change_group(instance._saved_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    _bump_post(instance)
+    search.remove_post(instance.pk)
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    counters.change_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if instance.post_id is not None:
+        _bump_post(instance.post)
+        if created:
+            search.add_comment(instance)
+        else:
+            search.index_post(instance.post)
+    if created:
+        CREATED.inc(model='comment')
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None:
+        _bump_post(post)
+        search.index_post(post)
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump_generation('groups')
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    bump_generation(f'follow:{instance.user_id}')
+    if created:
+        follows.follow_changed(instance.user_id, instance.author_id)
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+        feeds.follow_added(instance.user_id, instance.author_id)
+        suggestions.follow_added(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump_generation(f'follow:{instance.user_id}')
+    follows.follow_changed(instance.user_id, instance.author_id)
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+    feeds.follow_removed(instance.user_id, instance.author_id)
@@ -0,0 +1,166 @@
+"""Рекомендации «Кого почитать».
+
+Кандидаты для пользователя:
+- друзья друзей – авторы, на которых подписаны его подписки, с весом
+  FOLLOW_WEIGHT за каждую такую подписку;
+- соседи по группам – самые активные авторы групп, в которых он пишет,
+  с весом GROUP_WEIGHT за каждую общую группу.
+
+build() считает рекомендации пачками пользователей: подписки пачки и их
+подписки читаются парой запросов, веса складываются Counter по
+объединённым спискам. Для каждого пользователя хранятся
+SUGGESTIONS_COUNT лучших кандидатов, страницы их только читают.
+Новая подписка сразу добавляет к рекомендациям подписки нового автора
+(follow_added), полностью их пересчитывает команда build_suggestions.
+"""
+import heapq
+from collections import Counter, defaultdict
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from core.cache import shared_cache
+from core.utils import batches
+
+from . import follows
+from .models import Follow, Post, Suggestion, User
+
+FOLLOW_WEIGHT = 2
+GROUP_WEIGHT = 1
+# Из каждой группы кандидатами становятся только самые активные авторы.
+GROUP_AUTHORS = 50
+GROUP_AUTHORS_CACHE_KEY = 'suggestions:group_authors'
+GROUP_AUTHORS_TIMEOUT = 60 * 60
+BATCH_SIZE = 500
+
+
+def group_authors(refresh=False) -> dict:
+    """Самые активные авторы каждой группы: {группа: [авторы]}."""
+    cache = shared_cache()
+    authors = None if refresh else cache.get(GROUP_AUTHORS_CACHE_KEY)
+    if authors is None:
+        rows = (
+            Post.objects.filter(group__isnull=False)
+            .values_list('group_id', 'author_id')
+            .annotate(posts=Count('pk'))
+            .order_by('group_id', '-posts', 'author_id')
+        )
+        authors = defaultdict(list)
+        for group_id, author_id, _ in rows:
+            if len(authors[group_id]) < GROUP_AUTHORS:
+                authors[group_id].append(author_id)
+        authors = dict(authors)
+        cache.set(GROUP_AUTHORS_CACHE_KEY, authors, GROUP_AUTHORS_TIMEOUT)
+    return authors
+
+
+def _related(queryset, field, values, other) -> dict:
+    """{значение field: множество other} для values, пачками."""
+    related = defaultdict(set)
+    for batch in batches(values, BATCH_SIZE):
+        rows = queryset.filter(**{f'{field}__in': batch}).values_list(
+            field, other
+        )
+        for key, value in rows.distinct():
+            related[key].add(value)
+    return related
+
+
+def _scores(followed, second, groups, authors_by_group) -> dict:
+    friends = Counter(
+        chain.from_iterable(second.get(pk, ()) for pk in followed)
+    )
+    neighbours = Counter(
+        chain.from_iterable(authors_by_group.get(pk, ()) for pk in groups)
+    )
+    return {
+        pk: FOLLOW_WEIGHT * friends[pk] + GROUP_WEIGHT * neighbours[pk]
+        for pk in friends.keys() | neighbours.keys()
+    }
+
+
+def _top(user_id, scores, followed) -> list:
+    """SUGGESTIONS_COUNT лучших кандидатов; при равном весе – старшие."""
+    candidates = (
+        (score, author_id)
+        for author_id, score in scores.items()
+        if author_id != user_id and author_id not in followed
+    )
+    best = heapq.nlargest(
+        settings.SUGGESTIONS_COUNT,
+        candidates,
+        key=lambda candidate: (candidate[0], -candidate[1]),
+    )
+    return [
+        Suggestion(user_id=user_id, author_id=author_id, score=score)
+        for score, author_id in best
+    ]
+
+
+@transaction.atomic
+def _replace(user_ids, suggestions):
+    Suggestion.objects.filter(user_id__in=user_ids).delete()
+    Suggestion.objects.bulk_create(suggestions)
+
+
+def build(users=None) -> int:
+    """Пересчитывает рекомендации пользователей, возвращает их число."""
+    users = User.objects.all() if users is None else users
+    user_ids = list(users.order_by('pk').values_list('pk', flat=True))
+    authors_by_group = group_authors(refresh=True)
+    created = 0
+    for batch in batches(user_ids, BATCH_SIZE):
+        following = _related(Follow.objects, 'user_id', batch, 'author_id')
+        second = _related(
+            Follow.objects,
+            'user_id',
+            sorted(set().union(*following.values())),
+            'author_id',
+        )
+        groups = _related(
+            Post.objects.filter(group__isnull=False),
+            'author_id',
+            batch,
+            'group_id',
+        )
+        suggestions = []
+        for user_id in batch:
+            followed = following.get(user_id, set())
+            scores = _scores(
+                followed, second, groups.get(user_id, ()), authors_by_group
+            )
+            suggestions.extend(_top(user_id, scores, followed))
+        _replace(batch, suggestions)
+        created += len(suggestions)
+    return created
+
+
+def follow_added(user_id, author_id):
+    """Добавляет к рекомендациям подписчика подписки нового автора.
+
+    Веса кандидатов, не попавших в сохранённые рекомендации, неизвестны,
+    поэтому до следующего build() результат приблизительный.
+    """
+    scores = Counter(
+        dict(
+            Suggestion.objects.filter(user_id=user_id).values_list(
+                'author_id', 'score'
+            )
+        )
+    )
+    for candidate in follows.following(author_id):
+        scores[candidate] += FOLLOW_WEIGHT
+    _replace([user_id], _top(user_id, scores, follows.following(user_id)))
+
+
+def for_user(user) -> list:
+    """Сохранённые рекомендации пользователя вместе с авторами."""
+    if not user.is_authenticated:
+        return []
+    return list(
+        Suggestion.objects.filter(user=user).select_related('author')[
+            : settings.SUGGESTIONS_COUNT
+        ]
+    )
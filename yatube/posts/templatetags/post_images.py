@@ -0,0 +1,54 @@
+from django import template
+from django.conf import settings
+
+from posts.variants import parse_geometry
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post, geometry):
+    """Картинка поста с вариантами для srcset.
+
+    Пока варианты текущей картинки не готовы, выводится одна миниатюра
+    sorl-thumbnail того же размера, а не картинка целиком.
+    """
+    preset = settings.THUMBNAIL_PRESETS[geometry]
+    formats = preset['formats']
+    width, _ = parse_geometry(geometry)
+    variants = []
+    if post.image:
+        variants = [
+            variant
+            for variant in post.image_variants.all()
+            if variant.geometry == geometry
+            and variant.source == post.image.name
+        ]
+    sources = []
+    for fmt in formats:
+        same_format = [v for v in variants if v.format == fmt]
+        if same_format:
+            sources.append(
+                {
+                    'type': f'image/{fmt}',
+                    'srcset': ', '.join(
+                        f'{v.image.url} {v.width}w' for v in same_format
+                    ),
+                    'variants': same_format,
+                }
+            )
+
+    fallback = None
+    if sources:
+        fallback = min(
+            sources[-1]['variants'], key=lambda v: abs(v.width - width)
+        )
+    return {
+        'post': post,
+        'sources': sources,
+        'fallback': fallback,
+        'sizes': f'(max-width: {width}px) 100vw, {width}px',
+        'geometry': geometry,
+        'crop': preset['crop'],
+        'upscale': preset['upscale'],
+    }
@@ -0,0 +1,62 @@
+from django.test import SimpleTestCase, override_settings
+
+from posts.analysis import (
+    Analyzer,
+    get_analyzer,
+    normalize,
+    stem,
+    trigrams,
+)
+
+
+def upper_words(text):
+    return text.upper().split()
+
+
+class AnalysisTest(SimpleTestCase):
+    def test_normalize(self):
+        """Нормализация приводит регистр, ё и ударения к одному виду."""
+        self.assertEqual(normalize('ЁЖИК Ёлка за́мок'), 'ежик елка замок')
+        self.assertEqual(normalize('ёж'), 'еж')
+
+    def test_stem(self):
+        """Стеммер совпадает с эталонными основами Snowball."""
+        stems = {
+            'вагонов': 'вагон',
+            'важнейшими': 'важн',
+            'важничаешь': 'важнича',
+            'важностью': 'важност',
+            'валандался': 'валанда',
+            'валериановых': 'валерианов',
+            'валяются': 'валя',
+            'испугавшись': 'испуга',
+            'прочитанных': 'прочита',
+            'длинный': 'длин',
+        }
+        for word, expected in stems.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+    def test_russian_analyzer(self):
+        """Русский анализатор убирает служебные слова и отрезает окончания,
+        слова на других алфавитах оставляет как есть.
+        """
+        self.assertEqual(
+            get_analyzer('russian')('Коты и собаки, cats and dogs 2022'),
+            ['кот', 'собак', 'cats', 'and', 'dogs', '2022'],
+        )
+
+    def test_trigrams(self):
+        """Триграммы заменяют длинные слова, короткие остаются целиком."""
+        self.assertEqual(trigrams(['кот', 'котик']), [
+            'кот', 'кот', 'оти', 'тик'
+        ])
+
+    def test_custom_analyzer(self):
+        """Анализатор можно собрать из фильтров или указать путём."""
+        analyzer = Analyzer(lambda tokens: [t[::-1] for t in tokens])
+        self.assertEqual(analyzer('Кот спит'), ['ток', 'типс'])
+
+        path = 'posts.tests.test_analysis.upper_words'
+        with override_settings(SEARCH_ANALYZER=path):
+            self.assertEqual(get_analyzer()('a b'), ['A', 'B'])
@@ -0,0 +1,536 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+
+from core.cache import get_generation
+from posts import benchmarks, search, thumbnails
+from posts.models import (
+    Comment,
+    FeedEntry,
+    Follow,
+    Group,
+    Post,
+    ThumbnailJob,
+    UserCounters,
+)
+from posts.transfer import bulk_insert
+from posts.urls import urlpatterns
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class BackfillFeedCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+
+    def test_backfill_restores_feed(self):
+        """Команда backfill_feed восстанавливает ленты подписок."""
+        FeedEntry.objects.all().delete()
+
+        call_command('backfill_feed', stdout=StringIO())
+
+        self.assertEqual(
+            set(
+                FeedEntry.objects.filter(user=self.user).values_list(
+                    'post', flat=True
+                )
+            ),
+            {post.pk for post in self.posts},
+        )
+
+
+class RecountCommandTest(TestCase):
+    def test_recount_repairs_drift(self):
+        """Команда recount исправляет расхождения счётчиков."""
+        user = User.objects.create_user(username='user')
+        group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.bulk_create(
+            Post(author=user, group=group, text=f'Пост {i}') for i in range(3)
+        )
+
+        call_command('recount', stdout=StringIO())
+
+        group.refresh_from_db()
+        self.assertEqual(group.posts_count, 3)
+        self.assertEqual(UserCounters.objects.get(user=user).posts_count, 3)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ProcessThumbnailsCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        self.post = Post.objects.create(
+            author=User.objects.create_user(username='user'),
+            text='Пост',
+            image=self._upload('small.gif'),
+        )
+
+    def _upload(self, name):
+        return SimpleUploadedFile(
+            name=name, content=self.small_gif, content_type='image/gif'
+        )
+
+    def _thumbnail_url(self):
+        return get_thumbnail(
+            self.post.image, '960x339', crop='center', upscale=True
+        ).url
+
+    def test_image_upload_enqueues_jobs(self):
+        """Сохранение картинки ставит миниатюры в очередь."""
+        self.assertEqual(
+            set(
+                ThumbnailJob.objects.filter(
+                    post=self.post, status=ThumbnailJob.PENDING
+                ).values_list('geometry', flat=True)
+            ),
+            set(settings.THUMBNAIL_PRESETS),
+        )
+
+        self.post.text = 'Изменённый пост'
+        self.post.save()
+        self.assertEqual(
+            ThumbnailJob.objects.filter(post=self.post).count(),
+            len(settings.THUMBNAIL_PRESETS),
+        )
+
+    def test_process_thumbnails(self):
+        """Команда process_thumbnails выполняет задания из очереди."""
+        call_command('process_thumbnails', workers=1, stdout=StringIO())
+
+        self.assertFalse(
+            ThumbnailJob.objects.exclude(status=ThumbnailJob.DONE).exists()
+        )
+        self.assertEqual(
+            set(
+                self.post.image_variants.filter(format='jpeg').values_list(
+                    'width', flat=True
+                )
+            ),
+            set(settings.THUMBNAIL_PRESETS['960x339']['widths']),
+        )
+
+    def test_stale_running_jobs_are_requeued(self):
+        """Задания упавшего обработчика возвращаются в очередь
+        по истечении срока, а выполняемые сейчас остаются в работе.
+        """
+        stale = ThumbnailJob.objects.get(post=self.post)
+        now = timezone.now()
+        lease = timedelta(seconds=settings.THUMBNAIL_LEASE_SECONDS)
+        ThumbnailJob.objects.filter(pk=stale.pk).update(
+            status=ThumbnailJob.RUNNING, claimed=now - lease - timedelta(1)
+        )
+        running = ThumbnailJob.objects.create(
+            post=self.post,
+            geometry=stale.geometry,
+            status=ThumbnailJob.RUNNING,
+            claimed=now,
+        )
+
+        call_command('process_thumbnails', workers=1, stdout=StringIO())
+
+        stale.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(stale.status, ThumbnailJob.DONE)
+        self.assertEqual(stale.attempts, 1)
+        self.assertEqual(running.status, ThumbnailJob.RUNNING)
+
+        ThumbnailJob.objects.filter(pk=stale.pk).update(
+            status=ThumbnailJob.RUNNING,
+            claimed=None,
+            attempts=settings.THUMBNAIL_MAX_ATTEMPTS - 1,
+        )
+        self.assertEqual(thumbnails.requeue_stale(), 1)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, ThumbnailJob.FAILED)
+
+    def test_post_page_uses_variants(self):
+        """Пока варианты не готовы, страница поста выводит миниатюру
+        вместо картинки целиком, а затем варианты в srcset.
+        """
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertContains(response, self._thumbnail_url())
+        self.assertNotContains(response, f'"{self.post.image.url}"')
+
+        call_command('process_thumbnails', workers=1, stdout=StringIO())
+
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        variant = self.post.image_variants.get(width=480, format='jpeg')
+        self.assertContains(response, f'{variant.image.url} 480w')
+
+    def test_variants_follow_current_image(self):
+        """Смена или удаление картинки удаляют её варианты,
+        а выполненное задание сбрасывает кэш лент.
+        """
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        generation = get_generation('posts')
+        call_command('process_thumbnails', workers=1, stdout=StringIO())
+        self.assertNotEqual(get_generation('posts'), generation)
+        old = self.post.image_variants.get(width=480, format='jpeg')
+
+        self.post.image = self._upload('other.gif')
+        self.post.save()
+        self.assertFalse(self.post.image_variants.exists())
+        response = self.client.get(url)
+        self.assertContains(response, self._thumbnail_url())
+        self.assertNotContains(response, old.image.url)
+
+        call_command('process_thumbnails', workers=1, stdout=StringIO())
+        self.post.image = ''
+        self.post.save()
+        self.assertFalse(self.post.image_variants.exists())
+        self.assertFalse(
+            ThumbnailJob.objects.filter(
+                post=self.post, status=ThumbnailJob.PENDING
+            ).exists()
+        )
+
+    def test_stale_variants_are_not_shown(self):
+        """Варианты другой картинки не выводятся, как и варианты поста,
+        картинку которого убрали в обход сигналов.
+        """
+        call_command('process_thumbnails', workers=1, stdout=StringIO())
+        variant = self.post.image_variants.get(width=480, format='jpeg')
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+
+        self.post.image_variants.update(source='posts/other.gif')
+        self.assertNotContains(self.client.get(url), variant.image.url)
+
+        Post.objects.filter(pk=self.post.pk).update(image='')
+        self.post.image_variants.update(source='')
+        response = self.client.get(url)
+        self.assertNotContains(response, variant.image.url)
+        self.assertNotContains(response, '<img class="card-img')
+
+
+class BenchmarkSearchCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=author, text='Коты спят')
+
+    def test_benchmark_keeps_index(self):
+        """Команда benchmark_search сравнивает анализаторы
+        и не меняет рабочий индекс.
+        """
+        out = StringIO()
+
+        call_command(
+            'benchmark_search', '--repeat', '2', '--sample', '1', stdout=out
+        )
+
+        for analyzer in ('simple', 'russian', 'trigram'):
+            self.assertIn(analyzer, out.getvalue())
+        self.assertEqual(list(search.search('кот')), [self.post])
+
+
+class TransferCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Коты, "кавычки"\nи,'
+        )
+        Comment.objects.create(post=cls.post, author=cls.user, text='Ура')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def transfer(self, data_format):
+        tables = ('groups', 'posts', 'comments', 'follows')
+        for table in tables:
+            call_command(
+                'export_data',
+                table,
+                f'{self.directory}/{table}.{data_format}',
+                stderr=StringIO(),
+            )
+        for model in (Follow, Comment, Post, Group):
+            model.objects.all().delete()
+        for table in tables:
+            call_command(
+                'import_data',
+                table,
+                f'{self.directory}/{table}.{data_format}',
+                '--batch-size',
+                '1',
+                stdout=StringIO(),
+                stderr=StringIO(),
+            )
+
+    def assert_restored(self):
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text, self.post.text)
+        self.assertEqual(post.pub_date, self.post.pub_date)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.comments_count, 1)
+        self.assertTrue(
+            Comment.objects.filter(post=post, author=self.user).exists()
+        )
+        self.assertEqual(
+            UserCounters.objects.get(user=self.user).following_count, 1
+        )
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertEqual(list(search.search('ура')), [post])
+
+    def test_ndjson_round_trip(self):
+        """Выгрузка и загрузка NDJSON восстанавливают данные."""
+        self.transfer('ndjson')
+        self.assert_restored()
+
+    def test_csv_round_trip(self):
+        """Выгрузка и загрузка CSV восстанавливают данные."""
+        self.transfer('csv')
+        self.assert_restored()
+
+    def test_batch_larger_than_database_limit(self):
+        """Пачка больше лимита SQLite на число строк в запросе
+        загружается целиком.
+        """
+        path = f'{self.directory}/posts.ndjson'
+        with open(path, 'w', encoding='utf-8') as stream:
+            for i in range(600):
+                stream.write(f'{{"text": "Пост {i}", "author": "author"}}\n')
+
+        call_command(
+            'import_data', 'posts', path, stdout=StringIO(), stderr=StringIO()
+        )
+
+        self.assertEqual(Post.objects.filter(author=self.author).count(), 601)
+
+    def test_bulk_insert_keeps_dates(self):
+        """bulk_insert сохраняет заданные даты, остальным ставит текущую
+        и не отключает auto_now_add у поля.
+        """
+        old = timezone.now() - timedelta(days=30)
+        started = timezone.now()
+
+        inserted = bulk_insert(
+            Post,
+            [
+                Post(author=self.author, text='Старый', pub_date=old),
+                Post(author=self.author, text='Новый'),
+            ],
+        )
+
+        self.assertEqual(inserted, 2)
+        self.assertEqual(Post.objects.get(text='Старый').pub_date, old)
+        self.assertGreaterEqual(
+            Post.objects.get(text='Новый').pub_date, started
+        )
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+
+    def test_conflicting_rows_are_counted(self):
+        """Строки, которые нарушают уникальность, входят в число
+        пропущенных и не меняют существующие записи.
+        """
+        path = f'{self.directory}/posts.ndjson'
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(
+                f'{{"id": {self.post.pk}, "text": "Дубль", '
+                f'"pub_date": "2000-01-01T00:00:00+00:00", '
+                f'"author": "author"}}\n'
+                '{"text": "Новый", "author": "author"}\n'
+            )
+        out = StringIO()
+
+        call_command(
+            'import_data', 'posts', path, stdout=out, stderr=StringIO()
+        )
+
+        self.assertIn('добавлено: 1, пропущено: 1', out.getvalue())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text, self.post.text)
+        self.assertEqual(post.pub_date, self.post.pub_date)
+
+    def test_unknown_references_are_skipped(self):
+        """Строки со ссылками на несуществующие объекты пропускаются."""
+        path = f'{self.directory}/posts.ndjson'
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(
+                '{"text": "Новый", "author": "author"}\n'
+                '{"text": "Чужой", "author": "nobody"}\n'
+            )
+        errors = StringIO()
+
+        call_command(
+            'import_data', 'posts', path, stdout=StringIO(), stderr=errors
+        )
+
+        self.assertTrue(Post.objects.filter(text='Новый').exists())
+        self.assertFalse(Post.objects.filter(text='Чужой').exists())
+        self.assertIn('author=nobody', errors.getvalue())
+
+
+class GenerateDataCommandTest(TestCase):
+    def generate(self, prefix):
+        call_command(
+            'generate_data',
+            '--users', '30',
+            '--groups', '3',
+            '--posts', '200',
+            '--comments', '100',
+            '--follows', '5',
+            '--prefix', prefix,
+            '--batch-size', '7',
+            stdout=StringIO(),
+            stderr=StringIO(),
+        )
+        return Post.objects.filter(
+            author__username__startswith=f'{prefix}_'
+        ).order_by('pk')
+
+    def test_generates_dataset(self):
+        """Команда generate_data создаёт связанные данные и пересчитывает
+        счётчики и ленты.
+        """
+        posts = self.generate('load')
+
+        self.assertEqual(posts.count(), 200)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertTrue(Comment.objects.exists())
+        follow = Follow.objects.first()
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        self.assertEqual(
+            UserCounters.objects.get(user=follow.author).followers_count,
+            Follow.objects.filter(author=follow.author).count(),
+        )
+        self.assertTrue(FeedEntry.objects.filter(user=follow.user).exists())
+
+        per_author = sorted(
+            posts.order_by()
+            .values('author')
+            .annotate(count=Count('pk'))
+            .values_list('count', flat=True),
+            reverse=True,
+        )
+        self.assertGreater(per_author[0], 5 * per_author[len(per_author) // 2])
+
+    def test_same_seed_gives_same_data(self):
+        """Одинаковые параметры дают одинаковые данные."""
+        first = list(self.generate('first').values_list('text', 'pub_date'))
+        second = list(self.generate('second').values_list('text', 'pub_date'))
+
+        self.assertEqual(
+            [text for text, _ in first], [text for text, _ in second]
+        )
+
+    def test_existing_prefix_is_rejected(self):
+        """Повторная генерация с тем же префиксом запрещена."""
+        self.generate('load')
+
+        with self.assertRaises(CommandError):
+            self.generate('load')
+
+
+class BenchmarksTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.targets = benchmarks.load_dataset(
+            users=20, groups=2, posts=100, comments=100, follows=5
+        )
+
+    def test_scenarios_cover_posts_urls(self):
+        """Сценарии есть для каждого адреса posts/urls.py."""
+        self.assertEqual(
+            set(benchmarks.SCENARIOS),
+            {f'posts:{pattern.name}' for pattern in urlpatterns},
+        )
+
+    def test_run_measures_every_scenario(self):
+        """Замеры содержат время, запросы и время отрисовки шаблона."""
+        results = benchmarks.run(self.targets, iterations=2)
+
+        self.assertEqual(set(results), set(benchmarks.SCENARIOS))
+        self.assertGreater(results['posts:post_detail']['queries'], 0)
+        self.assertGreater(results['posts:index']['render_p50_ms'], 0)
+        self.assertEqual(benchmarks.check_budgets(results, budgets={}), [])
+
+    def test_check_budgets_reports_regressions(self):
+        """Превышение бюджета и ответы с ошибкой попадают в нарушения."""
+        results = {
+            'posts:index': {'statuses': [200], 'queries': 5, 'p95_ms': 1},
+            'posts:profile': {'statuses': [404], 'queries': 1, 'p95_ms': 1},
+        }
+
+        violations = benchmarks.check_budgets(
+            results, budgets={'posts:index': {'queries': 3, 'p95_ms': 10}}
+        )
+
+        self.assertEqual(len(violations), 2)
+        self.assertIn('posts:index: queries = 5', violations[0])
+        self.assertIn('404', violations[1])
+
+
+class ExplainFeedsCommandTest(TestCase):
+    def test_feeds_use_indexes(self):
+        """Запросы лент выполняются без полного просмотра таблиц."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.bulk_create(
+            Post(author=author, group=group, text=f'Пост {number}')
+            for number in range(settings.POSTS_PER_PAGE)
+        )
+        post = Post.objects.create(author=author, group=group, text='Пост')
+        Comment.objects.create(post=post, author=reader, text='Текст')
+        Follow.objects.create(user=reader, author=author)
+        out = StringIO()
+
+        call_command('explain_feeds', stdout=out)
+
+        self.assertIn('с полным просмотром: 0', out.getvalue())
+        self.assertEqual(Post.objects.count(), settings.POSTS_PER_PAGE + 1)
+
+    def test_requires_posts(self):
+        """Без постов строить планы не на чем."""
+        with self.assertRaises(CommandError):
+            call_command('explain_feeds', stdout=StringIO())
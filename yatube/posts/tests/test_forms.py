@@ -1,10 +1,13 @@
 from http import HTTPStatus
+from io import BytesIO
 
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from posts.forms import PostForm
 from posts.models import Comment, Group, Post
 
 User = get_user_model()
@@ -112,6 +115,20 @@ class PostsFormTests(TestCase):
             response.status_code, HTTPStatus.OK, 'Запрос не вернул код 200.'
         )
 
+    def test_add_second_comment(self):
+        """Пользователь может оставить к посту несколько комментариев."""
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        url = reverse('posts:add_comment', kwargs={'post_id': post.pk})
+
+        for text in ('Первый', 'Второй'):
+            response = self.authorized_client.post(url, {'text': text})
+            self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+        self.assertEqual(
+            set(post.comments.values_list('text', flat=True)),
+            {'Первый', 'Второй'},
+        )
+
 
 class PostCreateViewTest(TestCase):
     @classmethod
@@ -194,3 +211,122 @@ class PostCreateViewTest(TestCase):
         self.assertEqual(
             response.status_code, HTTPStatus.OK, 'Запрос не вернул код 200.'
         )
+
+
+def make_image(image_format, size=(4, 2), **params):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, image_format, **params)
+    return SimpleUploadedFile(
+        name=f'image.{image_format.lower()}',
+        content=buffer.getvalue(),
+        content_type=f'image/{image_format.lower()}',
+    )
+
+
+def make_png(image, **params):
+    buffer = BytesIO()
+    image.save(buffer, 'PNG', **params)
+    return SimpleUploadedFile(
+        name='image.png', content=buffer.getvalue(), content_type='image/png'
+    )
+
+
+class PostImageUploadTest(TestCase):
+    def make_form(self, image):
+        return PostForm(data={'text': 'Пост с картинкой'}, files={
+            'image': image,
+        })
+
+    @override_settings(MAX_UPLOAD_SIZE=10)
+    def test_too_large_file(self):
+        """Файл больше MAX_UPLOAD_SIZE отклоняется без разбора картинки."""
+        form = self.make_form(make_image('PNG'))
+
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_disallowed_format(self):
+        """Картинка в неразрешённом формате отклоняется."""
+        form = self.make_form(make_image('BMP'))
+
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    @override_settings(MAX_IMAGE_PIXELS=7)
+    def test_too_many_pixels(self):
+        """Картинка больше MAX_IMAGE_PIXELS отклоняется."""
+        form = self.make_form(make_image('PNG'))
+
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_metadata_is_stripped(self):
+        """EXIF из загруженной картинки не сохраняется."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        form = self.make_form(make_image('JPEG', exif=exif.tobytes()))
+
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.size, (4, 2))
+            self.assertFalse(image.getexif())
+
+    def test_transparency_is_kept(self):
+        """Прозрачность PNG с альфа-каналом и с палитрой сохраняется."""
+        form = self.make_form(
+            make_png(Image.new('RGBA', (4, 2), (255, 0, 0, 0)))
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.mode, 'RGBA')
+            self.assertEqual(image.getpixel((0, 0)), (255, 0, 0, 0))
+
+        palette = Image.new('P', (4, 2), 1)
+        palette.putpalette([255, 0, 0, 0, 0, 255])
+        form = self.make_form(make_png(palette, transparency=1))
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.mode, 'P')
+            self.assertEqual(image.info['transparency'], 1)
+
+    def test_icc_profile_is_kept(self):
+        """Цветовой профиль картинки сохраняется."""
+        profile = b'icc profile'
+        form = self.make_form(make_image('JPEG', icc_profile=profile))
+
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.info['icc_profile'], profile)
+
+    def test_animation_is_kept(self):
+        """Все кадры анимированной картинки сохраняются."""
+        first, second = (Image.new('RGB', (4, 2), c) for c in ('red', 'blue'))
+        form = self.make_form(
+            make_png(first, save_all=True, append_images=[second], loop=0)
+        )
+
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.n_frames, 2)
+
+    @override_settings(MAX_IMAGE_PIXELS=15)
+    def test_too_many_frames(self):
+        """В MAX_IMAGE_PIXELS должны уложиться все кадры анимации."""
+        first, second = (Image.new('RGB', (4, 2), c) for c in ('red', 'blue'))
+        self.assertTrue(self.make_form(make_png(first)).is_valid())
+
+        form = self.make_form(
+            make_png(first, save_all=True, append_images=[second])
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+        buffer = BytesIO()
+        first.save(buffer, 'GIF', save_all=True, append_images=[second])
+        form = self.make_form(SimpleUploadedFile(
+            name='image.gif',
+            content=buffer.getvalue(),
+            content_type='image/gif',
+        ))
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
@@ -1,7 +1,10 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import DatabaseError, IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, UserCounters
 
 User = get_user_model()
 
@@ -71,3 +74,117 @@ class GroupModelTest(TestCase):
         """Проверяем, что у модели Group корректно работает __str__."""
         expected_object_name = self.group.title
         self.assertEqual(expected_object_name, str(self.group))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def _counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Счётчики постов автора и группы меняются вместе с постами."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        self.assertEqual(self._counters(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+
+        post.group = None
+        post.save()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+
+        post.delete()
+        self.assertEqual(self._counters(self.author).posts_count, 0)
+
+    def test_comment_counter(self):
+        """Счётчик комментариев поста меняется вместе с комментариями."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Счётчики подписок и подписчиков меняются вместе с подписками."""
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self._counters(self.author).followers_count, 1)
+        self.assertEqual(self._counters(self.user).following_count, 1)
+
+        follow.delete()
+        self.assertEqual(self._counters(self.author).followers_count, 0)
+        self.assertEqual(self._counters(self.user).following_count, 0)
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора не создаётся."""
+        Follow.objects.create(user=self.user, author=self.author)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self._counters(self.author).followers_count, 1)
+
+
+class CountersAtomicityTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+
+    def test_failed_counter_update_rolls_back_write(self):
+        """Если счётчик не обновился, строка тоже не записывается
+        и не удаляется.
+        """
+        for counter, write, written in (
+            (
+                'change_post',
+                lambda: Comment.objects.create(
+                    post=self.post, author=self.user, text='Комментарий'
+                ),
+                Comment.objects.all(),
+            ),
+            (
+                'change_group',
+                lambda: Post.objects.create(
+                    author=self.author, text='Пост', group=self.group
+                ),
+                Post.objects.filter(group=self.group),
+            ),
+            (
+                'change_user',
+                lambda: Follow.objects.create(
+                    user=self.user, author=self.author
+                ),
+                Follow.objects.all(),
+            ),
+        ):
+            with self.subTest(counter=counter):
+                with mock.patch(
+                    f'posts.counters.{counter}', side_effect=DatabaseError
+                ):
+                    with self.assertRaises(DatabaseError):
+                        write()
+                self.assertFalse(written.exists())
+
+        with mock.patch(
+            'posts.counters.change_user', side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                self.post.delete()
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
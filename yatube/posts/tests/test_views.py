@@ -1,15 +1,33 @@
+import re
+from datetime import timedelta
 from http import HTTPStatus
+from io import StringIO
 
 from django import forms
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
+from core.pagination import next_cursor, previous_cursor
+from posts import feeds, follows, suggestions, trending
 from posts.forms import PostForm
-from posts.models import Follow, Group, Post
-from yatube.settings import POSTS_PER_PAGE
+from posts.models import (
+    Comment,
+    FeedEntry,
+    Follow,
+    Group,
+    GroupTrend,
+    Post,
+    PostTrend,
+    Suggestion,
+)
+from yatube.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
 
 User = get_user_model()
 
@@ -384,6 +402,201 @@ class PaginatorViewsTest(TestCase):
                     f'Страница "{address}" имеет неверное количество страниц.',
                 )
 
+    def test_pages_by_cursor(self):
+        """Проверка навигации по страницам с помощью курсора"""
+        urls = (
+            reverse('posts:index'),
+            reverse(
+                'posts:group_list',
+                kwargs={'slug': self.group.slug},
+            ),
+            reverse(
+                'posts:profile',
+                kwargs={'username': self.user.username},
+            ),
+        )
+
+        for address in urls:
+            with self.subTest(address=address):
+                page_1 = self.client.get(address).context['page_obj']
+                page_2 = self.client.get(
+                    address, {'cursor': next_cursor(page_1)}
+                ).context['page_obj']
+                page_back = self.client.get(
+                    address, {'cursor': previous_cursor(page_2)}
+                ).context['page_obj']
+
+                self.assertEqual(
+                    list(page_2),
+                    list(self.client.get(address + '?page=2').context[
+                        'page_obj'
+                    ]),
+                    f'Курсор на странице "{address}" работает неверно.',
+                )
+                self.assertFalse(page_2.has_next())
+                self.assertEqual(list(page_back), list(page_1))
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор возвращает первую страницу"""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'not-a-cursor'}
+        )
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        page_obj = response.context['page_obj']
+        self.assertFalse(page_obj.has_previous())
+        self.assertEqual(
+            list(page_obj),
+            list(self.client.get(reverse('posts:index')).context['page_obj']),
+        )
+
+    def test_first_page_is_a_keyset_query(self):
+        """Первая страница читается без COUNT(*) и OFFSET, а навигация
+        ведёт по курсорам без номеров страниц.
+        """
+        address = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(address)
+
+        self.assertFalse(
+            [
+                query['sql']
+                for query in context.captured_queries
+                if 'COUNT(' in query['sql'] or 'OFFSET' in query['sql']
+            ]
+        )
+        self.assertEqual(len(response.context['page_obj']), POSTS_PER_PAGE)
+        self.assertContains(response, '?cursor=')
+        self.assertNotContains(response, '?page=')
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def _comment(self, number):
+        return Comment.objects.create(
+            post=self.post, author=self.author, text=f'Комментарий {number}'
+        )
+
+    def _detail(self, **data):
+        return self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)), data
+        )
+
+    def test_comments_are_paginated(self):
+        """Пост показывает первую страницу комментариев, остальные
+        подгружаются по курсору.
+        """
+        comments = [
+            self._comment(number) for number in range(COMMENTS_PER_PAGE + 3)
+        ]
+        comments.reverse()
+
+        response = self._detail()
+        first = response.context['comments']
+        self.assertEqual(list(first), comments[:COMMENTS_PER_PAGE])
+        self.assertContains(response, 'Показать ещё')
+
+        response = self.client.get(
+            reverse('posts:comments', args=(self.post.pk,)),
+            {'cursor': next_cursor(first)},
+        )
+        self.assertEqual(
+            list(response.context['comments']), comments[COMMENTS_PER_PAGE:]
+        )
+        self.assertNotContains(response, 'Показать ещё')
+
+        response = self._detail(comments=next_cursor(first))
+        self.assertEqual(
+            list(response.context['comments']), comments[COMMENTS_PER_PAGE:]
+        )
+
+    def test_query_count_does_not_depend_on_comments(self):
+        """Авторы комментариев загружаются вместе с комментариями."""
+        self._comment(0)
+        with CaptureQueriesContext(connection) as few:
+            self._detail()
+        for number in range(1, COMMENTS_PER_PAGE + 3):
+            self._comment(number)
+
+        with self.assertNumQueries(len(few)):
+            self._detail()
+
+    def test_comments_of_missing_post(self):
+        """Комментарии несуществующего поста – 404."""
+        response = self.client.get(reverse('posts:comments', args=(0,)))
+
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.follower, author=cls.user)
+
+    def setUp(self) -> None:
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.follower)
+
+    def _create_posts(self, prefix, count):
+        for i in range(count):
+            author = User.objects.create_user(username=f'{prefix}_{i}')
+            Follow.objects.create(user=self.follower, author=author)
+            Post.objects.create(author=author, text='Пост', group=self.group)
+            Post.objects.create(
+                author=self.user, text='Пост', group=self.group
+            )
+
+    def _count_queries(self, client, address):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            client.get(address)
+        return len(context.captured_queries)
+
+    def test_feed_query_count_does_not_depend_on_posts(self):
+        """Число запросов ленты не зависит от количества постов"""
+        urls = (
+            (self.client, reverse('posts:index')),
+            (
+                self.client,
+                reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            ),
+            (
+                self.client,
+                reverse(
+                    'posts:profile', kwargs={'username': self.user.username}
+                ),
+            ),
+            (self.authorized_client, reverse('posts:follow_index')),
+        )
+        self._create_posts('first', 1)
+        queries_before = [
+            self._count_queries(client, address) for client, address in urls
+        ]
+        self._create_posts('second', POSTS_PER_PAGE)
+
+        for (client, address), expected in zip(urls, queries_before):
+            with self.subTest(address=address):
+                self.assertEqual(
+                    self._count_queries(client, address),
+                    expected,
+                    f'Страница "{address}" делает запрос на каждый пост.',
+                )
+
 
 class CacheTest(TestCase):
     @classmethod
@@ -396,33 +609,80 @@ class CacheTest(TestCase):
             description='Тестовое описание',
         )
 
-    def test_cache_index(self):
-        """Проверка работы кэширования главной страницы."""
-        Post.objects.create(
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
             author=self.user,
             text='Тестовый пост',
             group=self.group,
         )
-        pre_cache_response = self.client.get('posts:index')
-        pre_cache_page = pre_cache_response.content
-        Post.objects.all().delete()
-        post_cache_response = self.client.get('posts:index')
-        post_cache_page = post_cache_response.content
-
-        self.assertEqual(
-            pre_cache_page,
-            post_cache_page,
-            'Кэнирование страницы index работает неправильно.',
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
         )
 
-        cache.clear()
-        after_clear_cache_response = self.client.get('posts:index')
+    def test_cache_is_used_without_changes(self):
+        """Без изменений постов ленты отдаются из кэша."""
+        for address in self.urls:
+            self.client.get(address)
+        Post.objects.filter(pk=self.post.pk).update(text='Изменённый пост')
 
-        self.assertNotEqual(
-            after_clear_cache_response,
-            post_cache_response,
-            'Кэнирование страницы index работает неправильно.',
-        )
+        for address in self.urls:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertContains(response, 'Тестовый пост')
+
+    def test_cache_is_invalidated_on_changes(self):
+        """После изменения поста ленты сразу показывают новые данные."""
+        for address in self.urls:
+            self.client.get(address)
+        self.post.text = 'Изменённый пост'
+        self.post.save()
+
+        for address in self.urls:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertContains(response, 'Изменённый пост')
+
+    def test_cache_hit_does_not_read_posts(self):
+        """Повторный запрос ленты не читает посты из базы."""
+        for address in self.urls:
+            self.client.get(address)
+
+        for address in self.urls:
+            with self.subTest(address=address):
+                with CaptureQueriesContext(connection) as context:
+                    self.client.get(address)
+                self.assertFalse([
+                    query['sql']
+                    for query in context.captured_queries
+                    if 'FROM "posts_post"' in query['sql']
+                ])
+
+    def test_cache_is_invalidated_on_author_changes(self):
+        """После смены имени автора ленты показывают новое имя."""
+        # Профиль выводит только имя пользователя, и не в карточках.
+        urls = self.urls[:2]
+        for address in urls:
+            self.client.get(address)
+        self.user.first_name = 'Новое'
+        self.user.last_name = 'Имя'
+        self.user.save()
+
+        for address in urls:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertContains(response, 'Новое Имя')
+
+    def test_cache_is_shared_between_users(self):
+        """Кэш главной страницы общий для всех пользователей."""
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='Изменённый пост')
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Тестовый пост')
 
 
 class FollowViewsTest(TestCase):
@@ -501,3 +761,536 @@ class FollowViewsTest(TestCase):
         )
 
         self.assertNotIn(post, response.context['page_obj'].object_list)
+
+    def test_follow_adds_existing_posts_to_feed(self):
+        """После подписки старые записи автора появляются в ленте,
+        после отписки – исчезают.
+        """
+        following = User.objects.create(username='auth1')
+        post = Post.objects.create(author=following, text='test')
+
+        self.client.get(
+            reverse(
+                'posts:profile_follow', kwargs={'username': following.username}
+            )
+        )
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'].object_list)
+
+        self.client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': following.username},
+            )
+        )
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertNotIn(post, response.context['page_obj'].object_list)
+
+
+@override_settings(
+    FEED_CELEBRITY_THRESHOLD=3, FEED_CELEBRITY_DEMOTE_THRESHOLD=2
+)
+class HybridFollowFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.celebrity = User.objects.create_user(username='celebrity')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        Follow.objects.create(user=self.user, author=self.author)
+        for user in (self.user, self.fan, self.reader):
+            Follow.objects.create(user=user, author=self.celebrity)
+
+    def test_celebrity_posts_are_not_fanned_out(self):
+        """Посты популярного автора не раскладываются по лентам,
+        но попадают в ленту подписок при чтении.
+        """
+        post = Post.objects.create(author=self.celebrity, text='Пост')
+
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_merged_feed_is_ordered_and_paginated(self):
+        """Слитая лента упорядочена по дате и листается курсором."""
+        posts = [
+            Post.objects.create(
+                author=(self.author, self.celebrity)[i % 2], text=f'Пост {i}'
+            )
+            for i in range(POSTS_PER_PAGE + 3)
+        ]
+        posts.reverse()
+
+        page_1 = self.client.get(reverse('posts:follow_index')).context[
+            'page_obj'
+        ]
+        page_2 = self.client.get(
+            reverse('posts:follow_index'), {'cursor': next_cursor(page_1)}
+        ).context['page_obj']
+
+        self.assertEqual(list(page_1) + list(page_2), posts)
+        self.assertFalse(page_2.has_next())
+
+    def test_author_losing_celebrity_status_is_fanned_out(self):
+        """После потери статуса популярного автора его посты
+        раскладываются по лентам подписчиков.
+        """
+        post = Post.objects.create(author=self.celebrity, text='Пост')
+
+        Follow.objects.filter(user=self.fan).delete()
+        with CaptureQueriesContext(connection) as context:
+            Follow.objects.filter(user=self.reader).delete()
+
+        self.assertEqual(
+            set(FeedEntry.objects.filter(post=post).values_list(
+                'user', flat=True
+            )),
+            {self.user.pk},
+        )
+        # Ленты всех подписчиков заполняются одним запросом.
+        self.assertEqual(
+            len([
+                query
+                for query in context.captured_queries
+                if query['sql'].startswith('INSERT')
+                and 'posts_feedentry' in query['sql']
+            ]),
+            1,
+        )
+
+    def test_celebrity_status_has_hysteresis(self):
+        """Статус не теряется, пока подписчиков не меньше
+        FEED_CELEBRITY_DEMOTE_THRESHOLD, и не возвращается, пока их
+        меньше FEED_CELEBRITY_THRESHOLD.
+        """
+        Follow.objects.filter(user=self.fan).delete()
+        self.assertIn(self.celebrity.pk, feeds.celebrities())
+
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertNotIn(self.celebrity.pk, feeds.celebrities())
+
+        Follow.objects.create(user=self.fan, author=self.celebrity)
+        self.assertNotIn(self.celebrity.pk, feeds.celebrities())
+        Follow.objects.create(user=self.reader, author=self.celebrity)
+        self.assertIn(self.celebrity.pk, feeds.celebrities())
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+        cls.stranger = User.objects.create_user(username='stranger')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        Follow.objects.create(user=self.user, author=self.author)
+
+    def test_follow_checks_use_cached_graph(self):
+        """Проверки подписок после первой не обращаются к базе."""
+        follows.is_following(self.user.pk, self.author.pk)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(follows.is_following(self.user.pk, self.author.pk))
+            self.assertFalse(
+                follows.is_following(self.user.pk, self.stranger.pk)
+            )
+            self.assertEqual(
+                follows.followed_authors(
+                    self.user.pk, [self.author.pk, self.stranger.pk]
+                ),
+                {self.author.pk},
+            )
+
+    def _queries_to(self, table, request):
+        with CaptureQueriesContext(connection) as context:
+            request()
+        return [
+            query['sql']
+            for query in context.captured_queries
+            if f'FROM "{table}"' in query['sql']
+        ]
+
+    def test_follow_views_use_cached_graph(self):
+        """Лента без подписок и повторная подписка не читают таблицы
+        постов и подписок.
+        """
+        self.client.force_login(self.stranger)
+        follows.following(self.stranger.pk)
+        self.assertFalse(self._queries_to(
+            'posts_post',
+            lambda: self.client.get(reverse('posts:follow_index')),
+        ))
+
+        self.client.force_login(self.user)
+        follows.following(self.user.pk)
+        url = reverse('posts:profile_follow', args=(self.author.username,))
+        self.assertFalse(self._queries_to(
+            'posts_follow', lambda: self.client.get(url)
+        ))
+        self.assertEqual(
+            Follow.objects.filter(user=self.user, author=self.author).count(),
+            1,
+        )
+
+    def test_graph_follows_changes(self):
+        """Подписка и отписка сразу видны в графе с обеих сторон."""
+        self.assertEqual(follows.followers(self.author.pk), {self.user.pk})
+        self.assertEqual(follows.mutual(self.user.pk), [])
+
+        Follow.objects.create(user=self.author, author=self.user)
+        self.assertEqual(follows.mutual(self.user.pk), [self.author.pk])
+
+        Follow.objects.filter(user=self.user).delete()
+        self.assertFalse(follows.is_following(self.user.pk, self.author.pk))
+        self.assertEqual(follows.followers(self.author.pk), frozenset())
+
+    def test_reset_after_bulk_load(self):
+        """После загрузки в обход сигналов граф сбрасывается целиком."""
+        self.assertFalse(follows.is_following(self.user.pk, self.stranger.pk))
+        Follow.objects.bulk_create(
+            [Follow(user=self.user, author=self.stranger)]
+        )
+
+        follows.reset()
+
+        self.assertTrue(follows.is_following(self.user.pk, self.stranger.pk))
+
+    def test_profile_shows_follow_state(self):
+        """Профиль показывает подписку в обе стороны и взаимные подписки."""
+        profile = reverse('posts:profile', args=(self.author.username,))
+        response = self.client.get(profile)
+        self.assertTrue(response.context['following'])
+        self.assertNotContains(response, 'Подписан на вас')
+
+        Follow.objects.create(user=self.author, author=self.user)
+        response = self.client.get(profile)
+        self.assertContains(response, 'Взаимная подписка')
+
+        response = self.client.get(
+            reverse('posts:profile', args=(self.user.username,))
+        )
+        self.assertContains(response, 'Взаимных подписок: 1')
+
+        self.client.force_login(self.stranger)
+        response = self.client.get(profile)
+        self.assertFalse(response.context['following'])
+
+
+class SuggestionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.friend = User.objects.create_user(username='friend')
+        cls.author = User.objects.create_user(username='author')
+        cls.neighbour = User.objects.create_user(username='neighbour')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        Follow.objects.create(user=self.user, author=self.friend)
+        Follow.objects.create(user=self.friend, author=self.author)
+        Post.objects.create(author=self.user, group=self.group, text='Пост')
+        Post.objects.create(
+            author=self.neighbour, group=self.group, text='Пост'
+        )
+
+    def _suggested(self, user):
+        return list(
+            Suggestion.objects.filter(user=user).values_list(
+                'author__username', 'score'
+            )
+        )
+
+    def test_build_ranks_candidates(self):
+        """Друзья друзей весят больше соседей по группе, подписки
+        и сам пользователь не рекомендуются.
+        """
+        call_command('build_suggestions', stdout=StringIO())
+
+        self.assertEqual(
+            self._suggested(self.user),
+            [
+                ('author', suggestions.FOLLOW_WEIGHT),
+                ('neighbour', suggestions.GROUP_WEIGHT),
+            ],
+        )
+
+    def test_new_follow_updates_suggestions(self):
+        """Подписка убирает автора из рекомендаций и добавляет
+        его подписки.
+        """
+        suggestions.build()
+        Follow.objects.create(user=self.author, author=self.neighbour)
+
+        Follow.objects.create(user=self.user, author=self.author)
+
+        self.assertEqual(
+            self._suggested(self.user),
+            [
+                (
+                    'neighbour',
+                    suggestions.FOLLOW_WEIGHT + suggestions.GROUP_WEIGHT,
+                ),
+            ],
+        )
+
+    def test_pages_show_stored_suggestions(self):
+        """Профиль и лента подписок показывают сохранённые рекомендации
+        одним запросом, ничего не вычисляя.
+        """
+        suggestions.build()
+        urls = (
+            reverse('posts:profile', args=(self.friend.username,)),
+            reverse('posts:follow_index'),
+        )
+        for address in urls:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertContains(response, 'Кого почитать')
+                self.assertEqual(
+                    [s.author for s in response.context['suggestions']],
+                    [self.author, self.neighbour],
+                )
+
+        with self.assertNumQueries(1):
+            suggestions.for_user(self.user)
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=1, TRENDING_WINDOW_DAYS=7)
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.hot = Post.objects.create(
+            author=self.author, group=self.group, text='Обсуждаемый'
+        )
+        self.quiet = Post.objects.create(author=self.reader, text='Тихий')
+
+    def _comment(self, post, hours_ago):
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Текст'
+        )
+        Comment.objects.filter(pk=comment.pk).update(
+            pub_date=self.now - timedelta(hours=hours_ago)
+        )
+
+    def _scores(self):
+        return dict(PostTrend.objects.values_list('post_id', 'score'))
+
+    def test_activity_decays(self):
+        """Комментарий теряет половину веса за период полураспада."""
+        self._comment(self.hot, hours_ago=0)
+        self._comment(self.quiet, hours_ago=1)
+
+        trending.update(now=self.now)
+
+        scores = self._scores()
+        self.assertAlmostEqual(scores[self.hot.pk], trending.COMMENT_WEIGHT)
+        self.assertAlmostEqual(
+            scores[self.quiet.pk], trending.COMMENT_WEIGHT / 2
+        )
+
+    def test_incremental_update_matches_full(self):
+        """Инкрементальный пересчёт даёт те же веса, что и полный,
+        а подписка поднимает посты автора.
+        """
+        self._comment(self.hot, hours_ago=2)
+        trending.update(now=self.now - timedelta(hours=1))
+        self._comment(self.hot, hours_ago=0)
+        Follow.objects.create(user=self.reader, author=self.author)
+
+        trending.update(now=self.now + timedelta(seconds=1))
+        incremental = self._scores()
+        trending.update(now=self.now + timedelta(seconds=1), full=True)
+
+        for post_id, score in self._scores().items():
+            self.assertAlmostEqual(incremental[post_id], score)
+        self.assertGreater(
+            incremental[self.hot.pk], trending.COMMENT_WEIGHT * 1.25
+        )
+        self.assertEqual(
+            GroupTrend.objects.get(group=self.group).score,
+            incremental[self.hot.pk],
+        )
+
+    def test_trending_page_and_sidebar(self):
+        """Лента популярного упорядочена по весу, группы выводятся
+        в боковой панели из кэша.
+        """
+        self._comment(self.quiet, hours_ago=0)
+        self._comment(self.hot, hours_ago=0)
+        self._comment(self.hot, hours_ago=0)
+        trending.update()
+
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.hot, self.quiet]
+        )
+        self.assertEqual(response.context['trending_groups'], [self.group])
+
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Популярные группы')
+        with self.assertNumQueries(0):
+            self.assertEqual(trending.top_groups(), [self.group])
+
+    def test_trending_next_page_link(self):
+        """Ссылка «Следующая» ведёт на вторую страницу популярного."""
+        for number in range(POSTS_PER_PAGE + 1):
+            post = Post.objects.create(author=self.author, text=f'{number}')
+            self._comment(post, hours_ago=0)
+        trending.update()
+        url = reverse('posts:trending')
+
+        response = self.client.get(url)
+        link = re.search(
+            r'href="(?P<query>\?[^"]+)">Следующая', response.content.decode()
+        )
+        next_page = self.client.get(f'{url}{link["query"]}')
+
+        first = {post.pk for post in response.context['page_obj']}
+        second = {post.pk for post in next_page.context['page_obj']}
+        self.assertEqual(len(first), POSTS_PER_PAGE)
+        self.assertTrue(second)
+        self.assertFalse(first & second)
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Ёжики и коты живут дружно. Коты спят.'
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.user, text='Собаки гуляют с котами'
+        )
+        cls.other = Post.objects.create(author=cls.user, text='Про погоду')
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return list(response.context['page_obj'])
+
+    def test_search_ranks_results(self):
+        """Поиск находит посты со всеми словами, совпадения в тексте
+        поста выше совпадений в комментариях.
+        """
+        Comment.objects.create(
+            post=self.other, author=self.reader, text='Лиса'
+        )
+        fox = Post.objects.create(author=self.user, text='Лиса')
+
+        self.assertEqual(self.search('ЛИСА'), [fox, self.other])
+        self.assertEqual(self.search('ежики коты'), [self.cats])
+        self.assertEqual(self.search('коты жирафы'), [])
+        self.assertEqual(self.search(''), [])
+
+    def test_search_matches_word_forms(self):
+        """Поиск находит другие формы слов и не учитывает служебные слова."""
+        self.assertEqual(self.search('кот'), [self.cats, self.dogs])
+        self.assertEqual(self.search('ежик и собаки'), [])
+        self.assertEqual(self.search('собака гуляла'), [self.dogs])
+        self.assertEqual(self.search('и'), [])
+
+    def test_search_follows_edits_and_comments(self):
+        """Индекс обновляется при изменении постов и комментариев."""
+        post = Post.objects.create(author=self.user, text='Про погоду')
+        post.text = 'Про погоду и бегемотов'
+        post.save()
+        comment = Comment.objects.create(
+            post=self.dogs, author=self.reader, text='Мои жирафы тоже'
+        )
+
+        self.assertEqual(self.search('бегемоты'), [post])
+        self.assertEqual(self.search('жирафы'), [self.dogs])
+
+        comment.delete()
+        post.delete()
+
+        self.assertEqual(self.search('жирафы'), [])
+        self.assertEqual(self.search('бегемоты'), [])
+
+    def test_comment_indexing_does_not_reread_comments(self):
+        """Новый комментарий индексируется без перечитывания остальных:
+        число запросов не зависит от числа комментариев к посту.
+        """
+        queries = []
+        for number in range(4):
+            author = User.objects.create_user(username=f'commenter{number}')
+            with CaptureQueriesContext(connection) as context:
+                Comment.objects.create(
+                    post=self.other,
+                    author=author,
+                    text=f'Жирафы и бегемоты {number}',
+                )
+            queries.append(len(context))
+            self.assertFalse(
+                [
+                    query
+                    for query in context.captured_queries
+                    if query['sql'].startswith('SELECT')
+                    and 'FROM "posts_comment"' in query['sql']
+                ]
+            )
+        # Первый комментарий добавляет термы, следующие – увеличивают вес.
+        queries = queries[1:]
+
+        self.assertEqual(len(set(queries)), 1)
+        self.assertEqual(self.search('жирафы бегемоты'), [self.other])
+
+    def test_search_is_paginated(self):
+        """Результаты поиска разбиты на страницы."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Страница {i}')
+            for i in range(POSTS_PER_PAGE + 1)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+
+        self.assertEqual(len(self.search('страница')), POSTS_PER_PAGE)
+        self.assertEqual(len(self.search('страница', page=2)), 1)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты и комментарии через индекс."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        Comment.objects.create(
+            post=self.dogs, author=self.reader, text='Хорошие собаки'
+        )
+        self.client.force_login(admin)
+
+        posts = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'ежики'}
+        ).context['cl'].result_list
+        comments = self.client.get(
+            reverse('admin:posts_comment_changelist'), {'q': 'собаки'}
+        ).context['cl'].result_list
+
+        self.assertEqual(set(posts), {self.cats})
+        self.assertEqual(len(comments), 1)
+
+
+@override_settings(SEARCH_BACKEND='postings')
+class PostingsSearchViewsTest(SearchViewsTest):
+    """Те же проверки для индекса без FTS5."""
@@ -0,0 +1,149 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from time import perf_counter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.cache import bump_generation
+from core.metrics import Histogram
+
+from . import variants
+from .models import ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+DURATION = Histogram(
+    'yatube_thumbnail_duration_seconds',
+    'Время подготовки одного варианта картинки',
+    ('geometry',),
+)
+
+LEASE_EXPIRED = 'Обработчик не завершил задание'
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def enqueue(post):
+    """Ставит в очередь подготовку вариантов новой картинки поста.
+
+    Варианты прежней картинки удаляются сразу: до выполнения заданий
+    страницы выводят саму картинку.
+    """
+    variants.remove(post)
+    if not post.image:
+        return
+    jobs = ThumbnailJob.objects.bulk_create(
+        ThumbnailJob(post=post, geometry=geometry)
+        for geometry in settings.THUMBNAIL_PRESETS
+    )
+    if settings.THUMBNAIL_WORKERS:
+        job_ids = [job.pk for job in jobs]
+        transaction.on_commit(lambda: _submit(job_ids))
+
+
+def _submit(job_ids):
+    executor = _get_executor()
+    for job_id in job_ids:
+        executor.submit(_run_in_thread, job_id)
+
+
+def _run_in_thread(job_id):
+    try:
+        return process(job_id)
+    finally:
+        close_old_connections()
+
+
+def process(job_id) -> bool:
+    """Выполняет задание, если его ещё не забрал другой обработчик."""
+    claimed = ThumbnailJob.objects.filter(
+        pk=job_id, status=ThumbnailJob.PENDING
+    ).update(status=ThumbnailJob.RUNNING, claimed=timezone.now())
+    if not claimed:
+        return False
+
+    job = ThumbnailJob.objects.select_related('post').get(pk=job_id)
+    try:
+        options = settings.THUMBNAIL_PRESETS[job.geometry]
+        if job.post.image:
+            started = perf_counter()
+            variants.generate(job.post, job.geometry, **options)
+            DURATION.observe(perf_counter() - started, geometry=job.geometry)
+    except Exception as error:
+        logger.exception('Не удалось подготовить миниатюру %s', job_id)
+        attempts = job.attempts + 1
+        ThumbnailJob.objects.filter(pk=job_id).update(
+            attempts=attempts,
+            error=str(error),
+            status=(
+                ThumbnailJob.FAILED
+                if attempts >= settings.THUMBNAIL_MAX_ATTEMPTS
+                else ThumbnailJob.PENDING
+            ),
+        )
+        return False
+
+    ThumbnailJob.objects.filter(pk=job_id).update(status=ThumbnailJob.DONE)
+    post = job.post
+    bump_generation(
+        'posts',
+        f'author:{post.author_id}',
+        *([f'group:{post.group_id}'] if post.group_id else []),
+    )
+    return True
+
+
+@transaction.atomic
+def requeue_stale(now=None) -> int:
+    """Возвращает в очередь задания, брошенные упавшими обработчиками.
+
+    Брошенным считается задание, которое выполняется дольше
+    THUMBNAIL_LEASE_SECONDS. Это засчитывается как неудачная попытка,
+    чтобы картинка, на которой падает обработчик, не разбиралась вечно.
+    """
+    now = now or timezone.now()
+    expired = now - timedelta(seconds=settings.THUMBNAIL_LEASE_SECONDS)
+    requeued = (
+        ThumbnailJob.objects.filter(status=ThumbnailJob.RUNNING)
+        .filter(Q(claimed__lt=expired) | Q(claimed__isnull=True))
+        .update(
+            status=ThumbnailJob.PENDING,
+            attempts=F('attempts') + 1,
+            error=LEASE_EXPIRED,
+        )
+    )
+    if requeued:
+        ThumbnailJob.objects.filter(
+            status=ThumbnailJob.PENDING,
+            attempts__gte=settings.THUMBNAIL_MAX_ATTEMPTS,
+        ).update(status=ThumbnailJob.FAILED)
+    return requeued
+
+
+def process_pending(limit=None, workers=1) -> int:
+    """Разбирает задания из очереди, возвращает число выполненных."""
+    requeue_stale()
+    job_ids = list(
+        ThumbnailJob.objects.filter(status=ThumbnailJob.PENDING).values_list(
+            'pk', flat=True
+        )[:limit]
+    )
+    if workers <= 1:
+        return sum(process(job_id) for job_id in job_ids)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(_run_in_thread, job_ids))
@@ -0,0 +1,308 @@
+"""Потоковые импорт и экспорт таблиц в NDJSON и CSV.
+
+Строки читаются и пишутся по одной, в базу попадают пачками через
+bulk_insert, поэтому расход памяти не зависит от объёма данных. Ссылки на
+пользователей и группы записываются естественными ключами (username, slug),
+на посты – номерами, и при импорте разрешаются одним запросом на пачку.
+"""
+import csv
+import json
+from datetime import datetime
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Case, Max, Value, When
+from django.utils import timezone
+
+from core.cache import bump_generation
+from core.utils import batches
+
+from . import counters, feeds, follows, search
+from .models import Comment, Follow, Group, Post, User
+
+FORMATS = ('ndjson', 'csv')
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Table:
+    """Описание таблицы: собственные поля и ссылки на другие модели."""
+
+    def __init__(self, model, fields, references=None):
+        self.model = model
+        self.fields = fields
+        self.references = references or {}
+
+    @property
+    def columns(self):
+        return self.fields + tuple(self.references)
+
+    def lookups(self):
+        """Выражения values_list для колонок экспорта."""
+        return self.fields + tuple(
+            f'{name}__{key}' for name, (_, key) in self.references.items()
+        )
+
+
+TABLES = {
+    'groups': Table(Group, ('id', 'title', 'slug', 'description')),
+    'posts': Table(
+        Post,
+        ('id', 'text', 'pub_date', 'image'),
+        {'author': (User, 'username'), 'group': (Group, 'slug')},
+    ),
+    'comments': Table(
+        Comment,
+        ('id', 'text', 'pub_date'),
+        {'post': (Post, 'pk'), 'author': (User, 'username')},
+    ),
+    'follows': Table(
+        Follow,
+        ('id', 'pub_date'),
+        {'user': (User, 'username'), 'author': (User, 'username')},
+    ),
+}
+
+
+def guess_format(path):
+    return 'csv' if str(path).lower().endswith('.csv') else 'ndjson'
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def write_rows(stream, data_format, columns, rows):
+    """Пишет кортежи значений в поток, возвращает их число."""
+    written = 0
+    if data_format == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(
+                '' if value is None else _serialize(value) for value in row
+            )
+            written += 1
+        return written
+
+    for row in rows:
+        record = dict(zip(columns, map(_serialize, row)))
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        written += 1
+    return written
+
+
+def read_rows(stream, data_format):
+    """Читает словари из потока, пустые значения CSV считает отсутствующими."""
+    if data_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield {
+                column: value
+                for column, value in row.items()
+                if value != ''
+            }
+        return
+
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def export_rows(table, batch_size=DEFAULT_BATCH_SIZE):
+    """Строки таблицы в порядке первичного ключа без загрузки в память."""
+    return (
+        table.model.objects.order_by('pk')
+        .values_list(*table.lookups())
+        .iterator(chunk_size=batch_size)
+    )
+
+
+def _restore_dates(model, objects, fields, started):
+    """Возвращает заданные даты строкам, которые вставил этот вызов.
+
+    Строки, пропущенные из-за конфликта, остались со старыми датами:
+    они раньше started и не обновляются.
+    """
+    pk = model._meta.pk
+    size = connection.ops.bulk_batch_size([pk, *fields], objects)
+    for batch in batches(objects, size):
+        rows = model._base_manager.filter(
+            pk__in=[obj.pk for obj in batch],
+            **{f'{field.attname}__gte': started for field in fields},
+        )
+        rows.update(**{
+            field.attname: Case(
+                *(
+                    When(pk=obj.pk, then=Value(getattr(obj, field.attname)))
+                    for obj in batch
+                ),
+                output_field=field,
+            )
+            for field in fields
+        })
+
+
+def bulk_insert(model, objects, ignore_conflicts=False) -> int:
+    """Вставляет объекты через bulk_create, сохраняя их даты.
+
+    bulk_create вызывает pre_save полей, и auto_now_add заменяет заданную
+    дату текущим временем. Поэтому после вставки даты возвращаются объектам
+    и одним UPDATE на пачку строкам, а объектам без номера номера выдаются
+    заранее, чтобы найти их строки. Текущее время ставится только объектам
+    без даты. Сигналы не отправляются. Возвращает число вставленных строк.
+    """
+    objects = list(objects)
+    manager = model._base_manager
+    now = timezone.now()
+    dated = [
+        field
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for obj in objects:
+        for field in dated:
+            if getattr(obj, field.attname) is None:
+                setattr(obj, field.attname, now)
+
+    numbered = dated and any(obj.pk is None for obj in objects)
+    if numbered:
+        last_pk = manager.aggregate(last=Max('pk'))['last'] or 0
+        for number, obj in enumerate(
+            (obj for obj in objects if obj.pk is None), last_pk + 1
+        ):
+            obj.pk = number
+
+    dates = [
+        [getattr(obj, field.attname) for field in dated] for obj in objects
+    ]
+    before = manager.count()
+    started = timezone.now()
+    manager.bulk_create(objects, ignore_conflicts=ignore_conflicts)
+    if dated:
+        for obj, values in zip(objects, dates):
+            for field, value in zip(dated, values):
+                setattr(obj, field.attname, value)
+        _restore_dates(model, objects, dated, started)
+    if numbered:
+        reset_sequences(model)
+    return manager.count() - before
+
+
+class Importer:
+    """Загружает строки одной таблицы пачками.
+
+    Строки со ссылками на отсутствующие объекты пропускаются и передаются
+    в on_error, а строки, которые нарушают уникальность, игнорирует база.
+    И те и другие входят в skipped, вставленные строки – в inserted.
+    """
+
+    def __init__(self, table, batch_size=DEFAULT_BATCH_SIZE, on_error=None):
+        self.table = table
+        self.batch_size = batch_size
+        self.on_error = on_error
+        self.read = self.inserted = self.skipped = 0
+
+    def _resolve(self, rows):
+        """Номера объектов, на которые ссылаются строки пачки."""
+        resolved = {}
+        for name, (model, key) in self.table.references.items():
+            values = {row[name] for row in rows if row.get(name) is not None}
+            if key == 'pk':
+                values = {int(value) for value in values}
+            resolved[name] = dict(
+                model.objects.filter(**{f'{key}__in': values}).values_list(
+                    key, 'pk'
+                )
+            )
+        return resolved
+
+    def _build(self, row, resolved, line):
+        model = self.table.model
+        values = {}
+        for name in self.table.fields:
+            if row.get(name) is not None:
+                field = model._meta.get_field(name)
+                values[name] = field.to_python(row[name])
+
+        for name, (_, key) in self.table.references.items():
+            value = row.get(name)
+            if value is None and model._meta.get_field(name).null:
+                continue
+            if key == 'pk' and value is not None:
+                value = int(value)
+            if value not in resolved[name]:
+                if self.on_error is not None:
+                    self.on_error(f'Строка {line}: не найдено {name}={value}')
+                return None
+            values[f'{name}_id'] = resolved[name][value]
+        return model(**values)
+
+    def _invalidate(self, objects):
+        """Сбрасывает кэш лент, в которые попали загруженные строки."""
+        model = self.table.model
+        if model in (Post, Comment):
+            if model is Comment:
+                objects = Post.objects.filter(
+                    pk__in={comment.post_id for comment in objects}
+                ).only('author_id', 'group_id')
+            scopes = {'posts'}
+            for post in objects:
+                scopes.add(f'author:{post.author_id}')
+                if post.group_id is not None:
+                    scopes.add(f'group:{post.group_id}')
+            bump_generation(*scopes)
+        elif model is Group:
+            bump_generation('groups')
+        elif model is Follow:
+            bump_generation(*{f'follow:{f.user_id}' for f in objects})
+            follows.reset()
+
+    def load(self, rows):
+        """Загружает строки, после каждой пачки возвращает число прочитанных.
+
+        Генератор, чтобы вызывающий код мог показывать прогресс.
+        """
+        model = self.table.model
+        explicit_ids = False
+        line = 0
+        for batch in batches(rows, self.batch_size):
+            resolved = self._resolve(batch)
+            objects = []
+            for row in batch:
+                line += 1
+                obj = self._build(row, resolved, line)
+                if obj is None:
+                    self.skipped += 1
+                    continue
+                explicit_ids = explicit_ids or obj.pk is not None
+                objects.append(obj)
+
+            with transaction.atomic():
+                inserted = bulk_insert(model, objects, ignore_conflicts=True)
+                self._invalidate(objects)
+            self.inserted += inserted
+            self.skipped += len(objects) - inserted
+            self.read += len(batch)
+            yield self.read
+
+        if explicit_ids:
+            reset_sequences(model)
+
+
+def reset_sequences(*models):
+    """Сдвигает счётчики первичных ключей за загруженные номера."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def rebuild_derived(table):
+    """Пересчитывает данные, которые при обычном сохранении ведут сигналы."""
+    counters.recount()
+    if table.model in (Post, Follow):
+        feeds.rebuild()
+    if table.model in (Post, Comment):
+        search.rebuild()
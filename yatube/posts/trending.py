@@ -0,0 +1,140 @@
+"""Популярные посты и группы.
+
+Вес поста складывается из комментариев к нему и подписок на его автора:
+каждое событие весит COMMENT_WEIGHT или FOLLOW_WEIGHT и затухает вдвое
+за TRENDING_HALF_LIFE_HOURS. В рейтинг попадают посты не старше
+TRENDING_WINDOW_DAYS, вес группы – сумма весов её постов.
+
+update() пересчитывает рейтинг инкрементально: веса из таблицы PostTrend
+умножаются на затухание за время с прошлого пересчёта, и к ним
+добавляются только события, случившиеся после него. Страницы читают
+готовые таблицы PostTrend и GroupTrend.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from core.cache import bump_generation, get_generation, shared_cache
+from core.utils import batches
+
+from .models import Comment, Follow, Group, GroupTrend, Post, PostTrend
+
+COMMENT_WEIGHT = 1.0
+FOLLOW_WEIGHT = 0.5
+# Посты с меньшим весом выпадают из рейтинга.
+MIN_SCORE = 0.01
+GENERATION = 'trending'
+GROUPS_CACHE_KEY = 'trending:groups:{generation}'
+GROUPS_CACHE_TIMEOUT = 24 * 60 * 60
+BATCH_SIZE = 500
+
+
+def _decay(since, now):
+    elapsed = (now - since).total_seconds()
+    return 0.5 ** (elapsed / (settings.TRENDING_HALF_LIFE_HOURS * 60 * 60))
+
+
+def _follow_scores(since, now, window_start):
+    """Вклад новых подписок в веса постов их авторов."""
+    authors = defaultdict(float)
+    follows = Follow.objects.filter(
+        pub_date__gt=since, pub_date__lte=now
+    ).values_list('author_id', 'pub_date')
+    for author_id, pub_date in follows:
+        authors[author_id] += FOLLOW_WEIGHT * _decay(pub_date, now)
+
+    scores = defaultdict(float)
+    for batch in batches(sorted(authors), BATCH_SIZE):
+        posts = Post.objects.filter(
+            author_id__in=batch, pub_date__gte=window_start
+        ).values_list('pk', 'author_id')
+        for post_id, author_id in posts:
+            scores[post_id] += authors[author_id]
+    return scores
+
+
+@transaction.atomic
+def update(now=None, full=False) -> int:
+    """Пересчитывает рейтинг, возвращает число популярных постов.
+
+    С full=True прошлые веса не используются, и все события окна
+    считаются заново.
+    """
+    now = now or timezone.now()
+    window_start = now - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    last = None
+    if not full:
+        last = PostTrend.objects.aggregate(last=Max('updated'))['last']
+
+    scores = defaultdict(float)
+    since = window_start
+    if last is not None:
+        since = max(last, window_start)
+        factor = _decay(last, now)
+        previous = PostTrend.objects.filter(
+            post__pub_date__gte=window_start
+        ).values_list('post_id', 'score')
+        for post_id, score in previous:
+            scores[post_id] = score * factor
+
+    comments = Comment.objects.filter(
+        pub_date__gt=since,
+        pub_date__lte=now,
+        post__pub_date__gte=window_start,
+    ).values_list('post_id', 'pub_date')
+    for post_id, pub_date in comments:
+        scores[post_id] += COMMENT_WEIGHT * _decay(pub_date, now)
+    for post_id, score in _follow_scores(since, now, window_start).items():
+        scores[post_id] += score
+
+    trends = [
+        PostTrend(post_id=post_id, score=score, updated=now)
+        for post_id, score in scores.items()
+        if score >= MIN_SCORE
+    ]
+    PostTrend.objects.all().delete()
+    PostTrend.objects.bulk_create(trends)
+
+    groups = (
+        PostTrend.objects.filter(post__group__isnull=False)
+        .order_by()
+        .values_list('post__group')
+        .annotate(score=Sum('score'))
+    )
+    GroupTrend.objects.all().delete()
+    GroupTrend.objects.bulk_create(
+        GroupTrend(group_id=group_id, score=score, updated=now)
+        for group_id, score in groups
+    )
+    bump_generation(GENERATION)
+    return len(trends)
+
+
+def posts():
+    """Популярные посты для ленты, от большего веса к меньшему."""
+    return (
+        Post.objects.feed()
+        .filter(trend__isnull=False)
+        .order_by('-trend__score', '-pk')
+    )
+
+
+def top_groups() -> list:
+    """TRENDING_GROUPS самых популярных групп для боковой панели."""
+    cache = shared_cache()
+    key = GROUPS_CACHE_KEY.format(
+        generation=get_generation('groups', GENERATION)
+    )
+    groups = cache.get(key)
+    if groups is None:
+        groups = list(
+            Group.objects.filter(trend__isnull=False).order_by(
+                '-trend__score', 'pk'
+            )[: settings.TRENDING_GROUPS]
+        )
+        cache.set(key, groups, GROUPS_CACHE_TIMEOUT)
+    return groups
@@ -0,0 +1,60 @@
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps, ImageSequence
+
+# Форматы без EXIF или с анимацией, которую не нужно пережимать.
+KEEP_AS_IS = ('GIF',)
+# Сведения, без которых картинка выглядит иначе: прозрачность, цветовой
+# профиль и параметры анимации. EXIF, XMP и комментарии удаляются.
+KEEP_INFO = ('transparency', 'icc_profile', 'duration', 'loop')
+
+
+def _clean_frame(frame, image_format):
+    clean = ImageOps.exif_transpose(frame)
+    clean.info = {}
+    if image_format == 'JPEG' and clean.mode not in ('RGB', 'L'):
+        clean = clean.convert('RGB')
+    return clean
+
+
+def strip_metadata(upload, image):
+    """Пережимает картинку без EXIF и других метаданных.
+
+    Прозрачность, цветовой профиль и все кадры анимации сохраняются.
+    Кадры раскодируются по одному по мере записи, а их суммарный размер
+    ограничен MAX_IMAGE_PIXELS ещё при проверке картинки. Результат больше
+    FILE_UPLOAD_MAX_MEMORY_SIZE сбрасывается во временный файл на диске.
+    """
+    if image.format in KEEP_AS_IS:
+        return upload
+
+    upload.seek(0)
+    with Image.open(upload) as source:
+        image_format = source.format
+        params = {
+            key: source.info[key] for key in KEEP_INFO if key in source.info
+        }
+        frames = (
+            _clean_frame(frame, image_format)
+            for frame in ImageSequence.Iterator(source)
+        )
+        first = next(frames)
+
+        buffer = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        first.save(
+            buffer,
+            image_format,
+            quality=90,
+            save_all=getattr(source, 'n_frames', 1) > 1,
+            append_images=frames,
+            **params,
+        )
+    size = buffer.tell()
+    buffer.seek(0)
+    return UploadedFile(
+        buffer, upload.name, upload.content_type, size, upload.charset
+    )
@@ -1,4 +1,5 @@
 from django import forms
+from django.conf import settings
 
 
 def validate_not_empty(value):
@@ -7,3 +8,23 @@ def validate_not_empty(value):
             'Это обязательное поле!',
             params={'value': value},
         )
+
+
+def validate_image(image):
+    """Проверяет формат и размер картинки по её заголовку.
+
+    У анимации в MAX_IMAGE_PIXELS должны уложиться все кадры вместе.
+    """
+    if image.format not in settings.ALLOWED_IMAGE_FORMATS:
+        raise forms.ValidationError(
+            'Поддерживаются только форматы %(formats)s.',
+            params={'formats': ', '.join(settings.ALLOWED_IMAGE_FORMATS)},
+        )
+    width, height = image.size
+    frames = getattr(image, 'n_frames', 1)
+    if frames * width * height > settings.MAX_IMAGE_PIXELS:
+        raise forms.ValidationError(
+            'Картинка слишком большая: %(width)s×%(height)s пикселей, '
+            'кадров: %(frames)s.',
+            params={'width': width, 'height': height, 'frames': frames},
+        )
@@ -0,0 +1,102 @@
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .models import ImageVariant
+
+CENTERING = {
+    'center': (0.5, 0.5),
+    'top': (0.5, 0.0),
+    'bottom': (0.5, 1.0),
+    'left': (0.0, 0.5),
+    'right': (1.0, 0.5),
+}
+EXTENSIONS = {'jpeg': 'jpg'}
+
+
+def supported_formats(formats):
+    """Форматы, которые умеет сохранять установленная сборка Pillow."""
+    Image.init()
+    return [fmt for fmt in formats if fmt.upper() in Image.SAVE]
+
+
+def parse_geometry(geometry):
+    width, height = geometry.split('x')
+    return int(width), int(height)
+
+
+def _encode(image, fmt, quality):
+    buffer = BytesIO()
+    image.save(buffer, fmt.upper(), quality=quality)
+    return ContentFile(buffer.getvalue())
+
+
+def generate(
+    post,
+    geometry,
+    widths,
+    formats,
+    crop='center',
+    upscale=False,
+    quality=80,
+):
+    """Готовит варианты картинки поста для всех ширин и форматов.
+
+    Пропорции берутся из geometry, картинка обрезается по crop. Ширины
+    больше исходной пропускаются, если не задан upscale. Прежние варианты
+    того же размера удаляются вместе с файлами.
+    """
+    width, height = parse_geometry(geometry)
+    with post.image.open('rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file)).convert('RGB')
+
+    targets = [w for w in widths if upscale or w <= image.width]
+    targets = targets or [min(widths)]
+    stem = PurePosixPath(post.image.name).stem
+    variants = []
+    for target in sorted(targets):
+        size = (target, round(target * height / width))
+        resized = ImageOps.fit(
+            image, size, Image.LANCZOS, centering=CENTERING[crop]
+        )
+        for fmt in supported_formats(formats):
+            variant = ImageVariant(
+                post=post,
+                geometry=geometry,
+                width=size[0],
+                height=size[1],
+                format=fmt,
+                source=post.image.name,
+            )
+            variant.image.save(
+                f'{post.pk}/{stem}_{geometry}_{target}.'
+                f'{EXTENSIONS.get(fmt, fmt)}',
+                _encode(resized, fmt, quality),
+                save=False,
+            )
+            variants.append(variant)
+
+    old = list(post.image_variants.filter(geometry=geometry))
+    with transaction.atomic():
+        ImageVariant.objects.filter(pk__in=[v.pk for v in old]).delete()
+        ImageVariant.objects.bulk_create(variants)
+    for variant in old:
+        variant.image.delete(save=False)
+    return variants
+
+
+def remove(post):
+    """Удаляет варианты картинки поста, файлы – после фиксации."""
+    old = list(post.image_variants.all())
+    if not old:
+        return
+    ImageVariant.objects.filter(pk__in=[v.pk for v in old]).delete()
+
+    def delete_files():
+        for variant in old:
+            variant.image.delete(save=False)
+
+    transaction.on_commit(delete_files)
@@ -1,39 +1,104 @@
+from hashlib import md5
+
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.core.paginator import Paginator
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect, render
 
-from yatube.settings import POSTS_PER_PAGE
+from core.cache import get_generation
+from core.pagination import CursorPaginator, page_state, restore_page
+from yatube.settings import (
+    COMMENTS_PER_PAGE,
+    PAGE_CACHE_SECONDS,
+    POSTS_PER_PAGE,
+)
 
+from . import counters, feeds, follows, search, suggestions, trending
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, User
+
+
+def _paginate(request, paginator):
+    """Функция получения объекта страницы по курсору или номеру"""
+    cursor = request.GET.get('cursor')
+    number = request.GET.get('page')
+
+    if cursor:
+        return paginator.get_cursor_page(cursor)
+    if number:
+        return paginator.get_page(number)
+
+    return paginator.first_page()
+
+
+def _cached_page(request, paginator, feed, generation):
+    """Функция получения объекта страницы через кэш.
+
+    Страница хранится под номером поколения ленты: пока лента не
+    изменилась, посты не читаются из базы даже для пустого фрагмента.
+    """
+    position = (
+        f'{feed}|{generation}|{request.GET.get("page", "")}|'
+        f'{request.GET.get("cursor", "")}'
+    )
+    key = f'page:{md5(position.encode()).hexdigest()}'
+    state = cache.get(key)
+    if state is not None:
+        return restore_page(paginator, state)
+
+    page = _paginate(request, paginator)
+    cache.set(key, page_state(page), PAGE_CACHE_SECONDS)
+    return page
 
 
-def _get_page_obj(request, posts):
+def _get_page_obj(request, posts, feed, generation):
     """Функция получения объекта страницы"""
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    return _cached_page(
+        request, CursorPaginator(posts, POSTS_PER_PAGE), feed, generation
+    )
+
+
+def _get_comments_page(request, post_id, parameter):
+    """Функция получения страницы комментариев поста по курсору"""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        COMMENTS_PER_PAGE,
+    )
+    cursor = request.GET.get(parameter)
+
+    if cursor:
+        return paginator.get_cursor_page(cursor)
 
-    return page_obj
+    return paginator.first_page()
 
 
 def index(request) -> HttpResponse:
     """Функция отображения для главной страницы."""
-    posts = Post.objects.all()
+    posts = Post.objects.feed()
+    generation = get_generation('groups', 'posts')
 
-    context = {'page_obj': _get_page_obj(request, posts)}
+    context = {
+        'page_obj': _get_page_obj(request, posts, 'index', generation),
+        'generation': generation,
+        'trending_groups': trending.top_groups(),
+    }
     return render(request, 'posts/index.html', context)
 
 
 def group_posts(request, slug: str) -> HttpResponse:
     """Функция отображения для страницы с постами конкретной группы."""
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.feed()
+    generation = get_generation('groups', f'group:{group.pk}')
 
     context = {
         'group': group,
-        'page_obj': _get_page_obj(request, posts),
+        'page_obj': _get_page_obj(
+            request, posts, f'group:{group.pk}', generation
+        ),
+        'generation': generation,
     }
 
     return render(request, 'posts/group_list.html', context)
@@ -41,31 +106,48 @@ def group_posts(request, slug: str) -> HttpResponse:
 
 def profile(request, username: str) -> HttpResponse:
     """Функция отображения для страницы с профилем пользователя."""
-    user = get_object_or_404(User, username=username)
-    posts = user.posts.all()
-    following = user.is_authenticated and user.following.exists()
+    user = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    user_counters = counters.for_user(user)
+    posts = user.posts.feed()
+    generation = get_generation('groups', f'author:{user.pk}')
+    viewer = request.user
     context = {
         'profile': user,
-        'page_obj': _get_page_obj(request, posts),
-        'following': following,
+        'counters': user_counters,
+        'page_obj': _get_page_obj(
+            request, posts, f'author:{user.pk}', generation
+        ),
+        'generation': generation,
+        'following': False,
+        'followed_by': False,
+        'suggestions': suggestions.for_user(viewer),
     }
+    if viewer == user:
+        context['mutual_count'] = len(follows.mutual(user.pk))
+    elif viewer.is_authenticated:
+        context['following'] = follows.is_following(viewer.pk, user.pk)
+        context['followed_by'] = follows.is_following(user.pk, viewer.pk)
     return render(request, 'posts/profile.html', context)
 
 
 def post_detail(request, post_id: int) -> HttpResponse:
     """Функция отображения для страницы с информацией о конкретном посте."""
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'), pk=post_id
+    )
+    comments = _get_comments_page(request, post.pk, 'comments')
     form = CommentForm(request.POST or None)
-    following = (
-        request.user.is_authenticated
-        and post.author.following.filter(user=request.user).exists()
+    following = request.user.is_authenticated and follows.is_following(
+        request.user.pk, post.author_id
     )
     return render(
         request,
         'posts/post_detail.html',
         {
             'post': post,
+            'author_counters': counters.for_user(post.author),
             'form': form,
             'comments': comments,
             'following': following,
@@ -73,10 +155,46 @@ def post_detail(request, post_id: int) -> HttpResponse:
     )
 
 
+def post_comments(request, post_id: int) -> HttpResponse:
+    """Функция отображения следующей страницы комментариев поста."""
+    comments = _get_comments_page(request, post_id, 'cursor')
+
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+
+    return render(
+        request,
+        'includes/comments.html',
+        {'post_id': post_id, 'comments': comments},
+    )
+
+
+def search_posts(request) -> HttpResponse:
+    """Функция отображения для страницы поиска по постам и комментариям."""
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search.search(query), POSTS_PER_PAGE)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def trending_posts(request) -> HttpResponse:
+    """Функция отображения для ленты популярных постов."""
+    paginator = Paginator(trending.posts(), POSTS_PER_PAGE)
+    context = {
+        'page_obj': paginator.get_page(request.GET.get('page')),
+        'generation': get_generation('groups', 'posts', trending.GENERATION),
+        'trending_groups': trending.top_groups(),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
 @login_required
 def post_create(request) -> HttpResponse:
     """Функция отображения для страницы создания постов."""
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
 
     if form.is_valid():
         post = form.save(commit=False)
@@ -114,9 +232,17 @@ def post_edit(request, post_id: int) -> HttpResponse:
 
 @login_required
 def follow_index(request):
-    authors: list = request.user.follower.values_list('author', flat=True)
-    posts = Post.objects.filter(author__id__in=authors)
-    context = {'page_obj': _get_page_obj(request, posts)}
+    paginator = feeds.paginator(request.user, POSTS_PER_PAGE)
+    generation = get_generation(
+        'groups', 'posts', f'follow:{request.user.pk}'
+    )
+    context = {
+        'page_obj': _cached_page(
+            request, paginator, f'follow:{request.user.pk}', generation
+        ),
+        'generation': generation,
+        'suggestions': suggestions.for_user(request.user),
+    }
     return render(request, 'posts/follow.html', context)
 
 
@@ -125,7 +251,13 @@ def profile_follow(request, username):
     author = User.objects.get(username=username)
 
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        if not follows.is_following(request.user.pk, author.pk):
+            try:
+                with transaction.atomic():
+                    Follow.objects.create(user=request.user, author=author)
+            except IntegrityError:
+                # Подписку уже создал параллельный запрос.
+                pass
         return redirect('posts:profile', username=username)
 
     return HttpResponseRedirect(request.META.get('HTTP_REFERER'))
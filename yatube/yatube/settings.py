@@ -4,6 +4,8 @@ load_dotenv()
 
 import os
 
+from core.utils import require_packages  # noqa: E402
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 SECRET_KEY = os.getenv(
@@ -28,6 +30,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
+    'core.metrics.MetricsMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,12 +64,69 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+DATABASE_ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+    'postgresql_pool': 'core.backends.postgresql_pool',
+}
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+# CONN_MAX_AGE – сколько секунд держать соединение между запросами,
+# HEALTH_CHECKS – проверять такое соединение в начале запроса.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'ENGINE': DATABASE_ENGINES.get(DB_ENGINE, DB_ENGINE),
+        'NAME': os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'USER': os.getenv('DB_USER', ''),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', ''),
+        'PORT': os.getenv('DB_PORT', ''),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'HEALTH_CHECKS': os.getenv('DB_HEALTH_CHECKS', '1') == '1',
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        },
     }
 }
+# Реплики для чтения: DB_REPLICAS – через запятую файлы SQLite или хосты
+# PostgreSQL. Без реплик всё читается из default.
+DB_REPLICAS = [name for name in os.getenv('DB_REPLICAS', '').split(',') if name]
+for number, replica in enumerate(DB_REPLICAS):
+    location = (
+        {'NAME': os.path.join(BASE_DIR, replica)}
+        if DB_ENGINE == 'sqlite'
+        else {'HOST': replica}
+    )
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        **location,
+        'TEST': {'MIRROR': 'default'},
+    }
+REPLICA_DATABASES = [f'replica_{number}' for number in range(len(DB_REPLICAS))]
+# Адреса, которые только читают, и сколько секунд после своей записи
+# пользователь читает из default.
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+    'posts:trending',
+    'posts:comments',
+)
+REPLICA_PIN_COOKIE = 'read_primary'
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 10))
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
+# Прагмы для каждого нового соединения SQLite.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -107,6 +169,21 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+# Сколько секунд страница ленты хранится в кэше под номером поколения.
+PAGE_CACHE_SECONDS = 10 * 60
+# Автор становится популярным, набрав FEED_CELEBRITY_THRESHOLD подписчиков,
+# и перестаёт им быть, когда их меньше FEED_CELEBRITY_DEMOTE_THRESHOLD:
+# колебания числа подписчиков у порога не перекладывают ленты.
+FEED_CELEBRITY_THRESHOLD = 1000
+FEED_CELEBRITY_DEMOTE_THRESHOLD = 900
+# Сколько рекомендаций «Кого почитать» хранится и показывается.
+SUGGESTIONS_COUNT = 5
+# Популярное: вес активности уменьшается вдвое за TRENDING_HALF_LIFE_HOURS,
+# в рейтинг попадают посты не старше TRENDING_WINDOW_DAYS.
+TRENDING_HALF_LIFE_HOURS = 24
+TRENDING_WINDOW_DAYS = 7
+TRENDING_GROUPS = 5
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -119,8 +196,133 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Размеры картинок постов, которые готовятся заранее: пропорции,
+# ширины для srcset и форматы в порядке предпочтения. Форматы, которые
+# не поддерживает установленный Pillow, пропускаются.
+THUMBNAIL_PRESETS = {
+    '960x339': {
+        'crop': 'center',
+        'upscale': True,
+        'widths': (480, 960, 1440),
+        'formats': ('avif', 'webp', 'jpeg'),
+    },
+}
+# Число потоков, которые готовят миниатюры в процессе веб-сервера.
+# При 0 очередь разбирает только команда process_thumbnails.
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 1))
+THUMBNAIL_MAX_ATTEMPTS = 3
+# Задание, которое выполняется дольше, считается брошенным упавшим
+# обработчиком и возвращается в очередь.
+THUMBNAIL_LEASE_SECONDS = 10 * 60
+
+FILE_UPLOAD_HANDLERS = [
+    'core.uploads.SizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40 * 1000 * 1000
+ALLOWED_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+# Индекс поиска: fts5 (только SQLite), postings (таблица SearchPosting,
+# любая база) или auto – FTS5, если он доступен.
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+# Анализатор текста: simple, russian, trigram или путь к своему. После
+# смены анализатора нужно выполнить rebuild_search_index.
+SEARCH_ANALYZER = os.getenv('SEARCH_ANALYZER', 'russian')
+SEARCH_MAX_RESULTS = 1000
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'redis': 'django_redis.cache.RedisCache',
+}
+# Общий кэш должен быть один на все процессы сервера, поэтому по умолчанию
+# он в файлах. Кэш в памяти процесса (locmem) – только для тестов.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'file')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache_backends.TwoLevelCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', 60)),
+            'LOCAL_MAX_ENTRIES': int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', 1000)),
+        },
+    },
+    'shared': {
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+    },
+}
+require_packages(DB_ENGINE, CACHE_BACKEND)
+
+# Размер данных для benchmark_views: аргументы DatasetGenerator.generate.
+BENCHMARK_DATASET = {
+    'users': 300,
+    'groups': 20,
+    'posts': 5000,
+    'comments': 10000,
+    'follows': 15,
+}
+# Бюджеты страниц: queries – наибольшее число SQL-запросов,
+# p95_ms – 95-й перцентиль времени ответа в миллисекундах.
+# Запас по времени большой: замеры зависят от машины.
+BENCHMARK_BUDGETS = {
+    'posts:index': {'queries': 2, 'p95_ms': 100},
+    'posts:group_list': {'queries': 3, 'p95_ms': 100},
+    'posts:profile': {'queries': 4, 'p95_ms': 100},
+    'posts:post_detail': {'queries': 3, 'p95_ms': 100},
+    'posts:comments': {'queries': 1, 'p95_ms': 100},
+    'posts:post_edit': {'queries': 5, 'p95_ms': 150},
+    'posts:post_create': {'queries': 3, 'p95_ms': 150},
+    'posts:add_comment': {'queries': 8, 'p95_ms': 150},
+    'posts:search': {'queries': 3, 'p95_ms': 300},
+    'posts:follow_index': {'queries': 3, 'p95_ms': 150},
+    'posts:trending': {'queries': 3, 'p95_ms': 100},
+    'posts:profile_follow': {'queries': 18, 'p95_ms': 150},
+    'posts:profile_unfollow': {'queries': 10, 'p95_ms': 150},
+}
+
+# Профилирование запросов: заголовок Server-Timing, журнал PROFILING_LOG
+# и панель для сотрудников. Включается переменной окружения PROFILING=1.
+PROFILING = os.getenv('PROFILING') == '1'
+PROFILING_DUPLICATE_THRESHOLD = 3
+PROFILING_LOG = os.getenv(
+    'PROFILING_LOG', os.path.join(BASE_DIR, 'profiling.log')
+)
+
+# Выборочный профилировщик в yatube/wsgi.py, стеки – /debug/stacks/.
+SAMPLING_PROFILER = os.getenv('SAMPLING_PROFILER') == '1'
+SAMPLING_PROFILER_INTERVAL = float(
+    os.getenv('SAMPLING_PROFILER_INTERVAL', 0.01)
+)
+
+# Если задан, /metrics отдаётся только с заголовком
+# Authorization: Bearer <METRICS_TOKEN>.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'profiling': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': PROFILING_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'core.profiling': {
+            'handlers': ['profiling'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
@@ -0,0 +1,5 @@
+"""Настройки тестов: общий кэш живёт в памяти процесса тестов."""
+from .settings import *  # noqa: F401,F403
+from .settings import CACHE_BACKENDS, CACHES
+
+CACHES['shared'] = {'BACKEND': CACHE_BACKENDS['locmem']}
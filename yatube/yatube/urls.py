@@ -3,12 +3,16 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import prometheus_metrics, sampled_stacks
+
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('about/', include('about.urls', namespace='about')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('debug/stacks/', sampled_stacks, name='sampled_stacks'),
+    path('metrics', prometheus_metrics, name='metrics'),
 ]
 
 handler404 = 'core.views.page_not_found'